@@ -0,0 +1,338 @@
+"""End-to-end load test of the HTTP API against a local LLM stand-in.
+
+Writes a synthetic corpus of question papers, starts the LLM stub and
+(unless --base-url is given) a server in a scratch directory pointed at
+it, then drives each phase under concurrent load:
+
+    upload    POST /api/upload-pdf, then polls the ingest job to completion
+    generate  POST /api/generate-questions
+    results   POST /api/save-test-result, GET /api/user-test-results,
+              GET /api/user-stats and POST /api/test-history (needs MONGODB_URI)
+
+Prints one JSON document with throughput and p50/p95/p99 latency per
+endpoint, the commit it ran against and its configuration, so runs can be
+diffed between commits. Exits non-zero if every request of some phase
+failed. Run from the backend directory:
+
+    python benchmarks/bench_e2e.py --pdfs 8 --pages 20 --generate-requests 200 --output before.json
+
+Against an already running server (e.g. under gunicorn), start that server
+with GROQ_API_URL set to the stub URL for --stub-port and pass --base-url.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_stub import LLMStub  # noqa: E402
+from synthetic_pdfs import SUBJECTS, write_corpus  # noqa: E402
+
+# The debug reloader of `python server.py` would fork a second server.
+LAUNCH_SCRIPT = """
+import os, server
+server.start_background_services()
+server.app.run(host='127.0.0.1', port=int(os.environ['PORT']), threaded=True)
+"""
+
+TOPICS = ("kinematics", "electrostatics", "optics", "thermodynamics", "chemical kinetics",
+          "electrochemistry", "organic reactions", "probability", "matrices", "integration")
+
+
+def percentile(sorted_values, fraction):
+    # Nearest rank, so every reported value is an observed latency.
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, wall_seconds):
+    latencies = sorted(seconds for seconds, ok in samples if ok)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, ok in samples if not ok),
+        "throughput_rps": round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+    }
+
+
+def run_load(call, items, concurrency):
+    """Run call(item) -> ok for every item on `concurrency` threads.
+
+    Returns ([(seconds, ok), ...], wall seconds)."""
+    def timed(item):
+        start = time.perf_counter()
+        try:
+            ok = call(item)
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(timed, items))
+    return samples, time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(workdir, port, stub_url, args):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')])),
+        PORT=str(port),
+        SERVING_MODE='standalone',
+        GROQ_API_URL=stub_url,
+        GROQ_API_KEY='stub',
+        GROQ_REQUESTS_PER_MINUTE=str(args.llm_requests_per_minute),
+        GROQ_TOKENS_PER_MINUTE=str(args.llm_tokens_per_minute),
+        MCQ_CACHE_MODE=args.mcq_cache_mode,
+        MCQ_CACHE_PATH=os.path.join(workdir, 'mcq_cache.sqlite3'),
+    )
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    return subprocess.Popen([sys.executable, '-c', LAUNCH_SCRIPT], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(base_url, timeout, process=None):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}; see server.log in the work directory")
+        try:
+            if requests.get(f"{base_url}/api/ready", timeout=2).status_code == 200:
+                return time.perf_counter() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"Server at {base_url} not ready after {timeout}s")
+
+
+def upload_phase(session, base_url, paths, args):
+    jobs = {}
+
+    def upload(path):
+        with open(path, 'rb') as f:
+            response = session.post(f"{base_url}/api/upload-pdf", files={'file': (os.path.basename(path), f, 'application/pdf')})
+        if response.status_code != 202:
+            return False
+        jobs[path] = (response.json()["status_url"], time.perf_counter())
+        return True
+
+    start = time.perf_counter()
+    samples, upload_wall = run_load(upload, paths, args.upload_concurrency)
+
+    ingest_seconds = []
+    failed = 0
+    pages = 0
+    pending = dict(jobs)
+    while pending and time.perf_counter() - start < args.ingest_timeout:
+        for path, (status_url, submitted) in list(pending.items()):
+            job = session.get(f"{base_url}{status_url}").json()
+            if job.get("status") in ("completed", "failed"):
+                del pending[path]
+                if job["status"] == "failed":
+                    failed += 1
+                else:
+                    ingest_seconds.append((time.perf_counter() - submitted, True))
+                    pages += job.get("pages_total") or 0
+        time.sleep(0.1)
+    ingest_wall = time.perf_counter() - start
+
+    ingest = summarize(ingest_seconds + [(0, False)] * (failed + len(pending)), ingest_wall)
+    ingest["pages_per_sec"] = round(pages / ingest_wall, 2) if ingest_wall else None
+    return {"upload-pdf": summarize(samples, upload_wall), "ingest-job": ingest}
+
+
+def generate_phase(session, base_url, args, rng):
+    subjects = ['All'] + list(SUBJECTS)
+    payloads = [
+        {
+            "subject": rng.choice(subjects),
+            "count": args.questions_per_request,
+            "topics": [rng.choice(TOPICS)] if rng.random() < args.topic_rate else [],
+        }
+        for _ in range(args.generate_requests)
+    ]
+    questions = []
+
+    def generate(payload):
+        response = session.post(f"{base_url}/api/generate-questions", json=payload, timeout=args.request_timeout)
+        if response.status_code != 200:
+            return False
+        questions.append(len(response.json()["questions"]))
+        return True
+
+    samples, wall = run_load(generate, payloads, args.generate_concurrency)
+    result = summarize(samples, wall)
+    result["questions_per_response"] = round(sum(questions) / len(questions), 2) if questions else None
+    return {"generate-questions": result}
+
+
+def results_phase(session, base_url, args, rng):
+    users = [f"bench-{uuid.uuid4().hex[:12]}" for _ in range(args.users)]
+    subjects = list(SUBJECTS)
+
+    def save(user_id):
+        total = args.questions_per_request
+        score = rng.randint(0, total)
+        subject = rng.choice(subjects)
+        now = datetime.now(timezone.utc).isoformat()
+        response = session.post(f"{base_url}/api/save-test-result", json={
+            "userId": user_id,
+            "testId": uuid.uuid4().hex,
+            "testType": "custom",
+            "subjects": [subject],
+            "totalQuestions": total,
+            "results": {
+                "score": score, "total": total, "percentage": round(100 * score / total, 2),
+                "subjectWiseResults": {subject: {"correct": score, "total": total}},
+            },
+            "timeTaken": rng.randint(60, 3600),
+            "completedAt": now,
+            "createdAt": now,
+        })
+        return response.status_code == 200
+
+    reads = {
+        "user-test-results": lambda user_id: session.get(f"{base_url}/api/user-test-results/{user_id}"),
+        "user-stats": lambda user_id: session.get(f"{base_url}/api/user-stats/{user_id}"),
+        "test-history": lambda user_id: session.post(f"{base_url}/api/test-history", json={"userId": user_id, "mode": "list"}),
+    }
+
+    phases = {}
+    samples, wall = run_load(save, [users[i % len(users)] for i in range(args.results_requests)], args.results_concurrency)
+    phases["save-test-result"] = summarize(samples, wall)
+    for name, read in reads.items():
+        samples, wall = run_load(
+            lambda user_id: read(user_id).status_code == 200,
+            [rng.choice(users) for _ in range(args.results_requests)],
+            args.results_concurrency,
+        )
+        phases[name] = summarize(samples, wall)
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', help='use a running server instead of starting one')
+    parser.add_argument('--port', type=int, default=5077, help='port of the server started by the benchmark')
+    parser.add_argument('--workdir', help='scratch directory (default: a new temporary directory)')
+    parser.add_argument('--seed', type=int, default=0)
+    corpus = parser.add_argument_group('corpus')
+    corpus.add_argument('--pdfs', type=int, default=4)
+    corpus.add_argument('--pages', type=int, default=12)
+    corpus.add_argument('--questions-per-page', type=int, default=6)
+    corpus.add_argument('--figure-rate', type=float, default=0.3)
+    stub = parser.add_argument_group('LLM stub')
+    stub.add_argument('--stub-port', type=int, default=0)
+    stub.add_argument('--llm-latency-ms', type=float, default=300)
+    stub.add_argument('--llm-jitter-ms', type=float, default=100)
+    stub.add_argument('--llm-rate-limit', type=float, default=0.02, help='fraction of LLM calls answered with 429')
+    stub.add_argument('--llm-retry-after', type=float, default=1.0)
+    server = parser.add_argument_group('started server')
+    # The server's own limits default to a real provider's free tier, which
+    # would make the limiter, not the code under test, the bottleneck.
+    server.add_argument('--llm-requests-per-minute', type=int, default=100000)
+    server.add_argument('--llm-tokens-per-minute', type=int, default=100000000)
+    server.add_argument('--mcq-cache-mode', choices=('reuse', 'regenerate'), default='regenerate')
+    server.add_argument('--ready-timeout', type=float, default=600)
+    load = parser.add_argument_group('load')
+    load.add_argument('--upload-concurrency', type=int, default=2)
+    load.add_argument('--ingest-timeout', type=float, default=1800)
+    load.add_argument('--generate-requests', type=int, default=100)
+    load.add_argument('--generate-concurrency', type=int, default=8)
+    load.add_argument('--questions-per-request', type=int, default=10)
+    load.add_argument('--topic-rate', type=float, default=0.5, help='fraction of generate requests with a topic')
+    load.add_argument('--request-timeout', type=float, default=300)
+    load.add_argument('--users', type=int, default=20)
+    load.add_argument('--results-requests', type=int, default=200)
+    load.add_argument('--results-concurrency', type=int, default=8)
+    load.add_argument('--skip', nargs='*', default=[], choices=('upload', 'generate', 'results'))
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='jeeace-bench-')
+    paths = write_corpus(os.path.join(workdir, 'corpus'), args.pdfs, args.pages,
+                         args.questions_per_page, args.figure_rate, args.seed)
+
+    llm = LLMStub(port=args.stub_port, latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+                  rate_limit=args.llm_rate_limit, retry_after=args.llm_retry_after, seed=args.seed).start()
+    process = None
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "workdir": workdir,
+        "phases": {},
+    }
+    try:
+        base_url = args.base_url
+        if base_url is None:
+            process = start_server(workdir, args.port, llm.url, args)
+            base_url = f"http://127.0.0.1:{args.port}"
+        else:
+            print(f"LLM stub listening on {llm.url}", file=sys.stderr)
+        report["startup_s"] = round(wait_ready(base_url, args.ready_timeout, process), 3)
+
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_maxsize=64))
+        if 'upload' not in args.skip:
+            report["phases"].update(upload_phase(session, base_url, paths, args))
+        if 'generate' not in args.skip:
+            report["phases"].update(generate_phase(session, base_url, args, rng))
+        if 'results' not in args.skip:
+            if args.base_url is None and not os.getenv('MONGODB_URI'):
+                report["skipped"] = {"results": "MONGODB_URI is not set"}
+            else:
+                report["phases"].update(results_phase(session, base_url, args, rng))
+
+        report["llm_stub"] = llm.snapshot_stats()
+        report["server_stats"] = session.get(f"{base_url}/api/stats").json()
+        # A phase where every request failed measured nothing; its latencies
+        # must not be compared against another run.
+        report["failed_phases"] = [
+            name for name, phase in report["phases"].items()
+            if phase["requests"] and phase["errors"] == phase["requests"]
+        ]
+    finally:
+        llm.stop()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    if report["failed_phases"]:
+        sys.exit(f"Every request failed in: {', '.join(report['failed_phases'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Per-item vs batched embedding throughput on the bundled PDFs.
+
+Run from the backend directory:
+
+    python benchmarks/bench_embedding.py --batch-sizes 16 32 64 128
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+def collect_texts(pdf_folder):
+    texts = []
+    with tempfile.TemporaryDirectory() as image_dir:
+        for filename in sorted(os.listdir(pdf_folder)):
+            if not filename.lower().endswith('.pdf'):
+                continue
+            questions, images, _, _ = server.extract_pdf_data_enhanced(os.path.join(pdf_folder, filename), image_dir)
+            texts.extend(q["text"] for q in questions)
+            texts.extend(server.image_embedding_text(img) for img in images)
+    return texts
+
+
+def time_per_item(texts):
+    start = time.perf_counter()
+    for text in texts:
+        server.get_embedder().encode([text])
+    return time.perf_counter() - start
+
+
+def time_batched(texts, batch_size):
+    start = time.perf_counter()
+    server.embed_texts(texts, batch_size=batch_size)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf-folder', default=server.pdf_folder)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[16, 32, 64, 128])
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    texts = collect_texts(args.pdf_folder)
+    if not texts:
+        print(f"No questions or images extracted from {args.pdf_folder}")
+        return
+
+    # Warm up so model initialisation is not billed to the first mode.
+    server.embed_texts(texts[:8])
+
+    results = {"items": len(texts), "per_item": len(texts) / time_per_item(texts), "batched": {}}
+    for batch_size in args.batch_sizes:
+        results["batched"][batch_size] = len(texts) / time_batched(texts, batch_size)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"Embedding {results['items']} items from {args.pdf_folder}")
+    print(f"  per-item:          {results['per_item']:8.1f} items/sec")
+    for batch_size, rate in results["batched"].items():
+        print(f"  batch_size={batch_size:<5}    {rate:8.1f} items/sec  ({rate / results['per_item']:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
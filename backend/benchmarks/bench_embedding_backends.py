@@ -0,0 +1,106 @@
+"""Throughput and agreement of the torch, onnx and onnx-int8 embedding backends.
+
+Embeds the same texts with every backend, reports texts/sec and how close
+each backend's vectors are to the torch ones (minimum and mean cosine,
+max absolute difference), plus recall@10 of a search over the corpus.
+Uses the questions of the bundled PDFs, or synthetic sentences with
+--synthetic. Run from the backend directory:
+
+    python benchmarks/bench_embedding_backends.py --backends torch onnx onnx-int8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding import EMBEDDING_BACKENDS, load_embedder  # noqa: E402
+from pdf_extraction import extract_questions_from_text  # noqa: E402
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+
+def pdf_texts(pdf_folder):
+    import fitz
+
+    texts = []
+    for filename in sorted(os.listdir(pdf_folder)):
+        if filename.lower().endswith('.pdf'):
+            with fitz.open(os.path.join(pdf_folder, filename)) as doc:
+                for page_num, page in enumerate(doc):
+                    texts.extend(q["text"] for q in extract_questions_from_text(page.get_text(), page_num, filename, None))
+    return texts
+
+
+def synthetic_texts(count, seed=0):
+    rng = random.Random(seed)
+    words = ("force mass velocity charge field energy reaction acid base equilibrium integral "
+             "matrix vector limit derivative probability circle triangle wave lens current").split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(10, 80))) for _ in range(count)]
+
+
+def recall_at_10(reference, candidate, queries=100):
+    queries = min(queries, len(reference))
+    truth = np.argsort(-(reference[:queries] @ reference.T), axis=1)[:, :10]
+    found = np.argsort(-(candidate[:queries] @ candidate.T), axis=1)[:, :10]
+    return sum(len(set(t) & set(f)) for t, f in zip(truth, found)) / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument('--pdf-folder', default='./pdfs')
+    parser.add_argument('--synthetic', type=int, default=0, help='use this many synthetic texts instead of the PDFs')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.synthetic) if args.synthetic else pdf_texts(args.pdf_folder)
+    if not texts:
+        print(f"No questions extracted from {args.pdf_folder}; try --synthetic 2000")
+        return
+
+    vectors = {}
+    results = {"texts": len(texts), "backends": {}}
+    for backend in args.backends:
+        start = time.perf_counter()
+        embedder = load_embedder(MODEL_NAME, backend)
+        load_s = time.perf_counter() - start
+        embedder.encode(texts[:8], batch_size=8)
+
+        start = time.perf_counter()
+        vectors[backend] = embedder.encode(texts, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        results["backends"][backend] = {"load_s": round(load_s, 2), "texts_per_sec": round(len(texts) / elapsed, 1)}
+
+    reference = vectors.get("torch")
+    if reference is not None:
+        for backend, candidate in vectors.items():
+            cosines = np.sum(reference * candidate, axis=1)
+            results["backends"][backend].update({
+                "min_cosine": round(float(cosines.min()), 5),
+                "mean_cosine": round(float(cosines.mean()), 5),
+                "max_abs_diff": round(float(np.abs(reference - candidate).max()), 5),
+                "recall@10": round(recall_at_10(reference, candidate), 4),
+            })
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"{results['texts']} texts, batch size {args.batch_size}")
+    for backend, row in results["backends"].items():
+        line = f"{backend:>10}: load {row['load_s']:6.2f}s  {row['texts_per_sec']:9.1f} texts/sec"
+        if "min_cosine" in row:
+            line += (f"  cosine vs torch min {row['min_cosine']:.5f} mean {row['mean_cosine']:.5f}"
+                     f"  max |diff| {row['max_abs_diff']:.5f}  recall@10 {row['recall@10']:.4f}")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
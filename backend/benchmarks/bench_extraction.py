@@ -0,0 +1,87 @@
+"""Pages/sec of PDF extraction for different numbers of worker processes.
+
+By default the bundled PDFs are concatenated into one document of at least
+--pages pages, so the parallel path has enough chunks to spread out. Run
+from the backend directory:
+
+    python benchmarks/bench_extraction.py --workers 1 2 4 8 --pages 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extraction import extract_pdf_pages  # noqa: E402
+
+
+def build_corpus_pdf(pdf_folder, min_pages, path):
+    sources = [os.path.join(pdf_folder, f) for f in sorted(os.listdir(pdf_folder)) if f.lower().endswith('.pdf')]
+    if not sources:
+        raise SystemExit(f"No PDFs found in {pdf_folder}")
+
+    out = fitz.open()
+    while len(out) < min_pages:
+        for source in sources:
+            with fitz.open(source) as doc:
+                out.insert_pdf(doc)
+    out.save(path)
+    out.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf-folder', default='./pdfs')
+    parser.add_argument('--pages', type=int, default=500, help='minimum pages in the benchmark document')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--chunk-pages', type=int, default=16)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'corpus.pdf')
+        build_corpus_pdf(args.pdf_folder, args.pages, pdf_path)
+        with fitz.open(pdf_path) as doc:
+            total_pages = len(doc)
+
+        for workers in sorted(set(args.workers)):
+            image_dir = os.path.join(tmp, f'images_{workers}')
+            os.makedirs(image_dir)
+            # Untimed warm-up so process start-up is not billed to the run.
+            if workers > 1:
+                extract_pdf_pages(pdf_path, image_dir, workers=workers, chunk_pages=args.chunk_pages)
+
+            start = time.perf_counter()
+            questions, images = extract_pdf_pages(pdf_path, image_dir, workers=workers, chunk_pages=args.chunk_pages)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "workers": workers,
+                "pages": total_pages,
+                "seconds": round(elapsed, 3),
+                "pages_per_sec": round(total_pages / elapsed, 1),
+                "questions": len(questions),
+                "images": len(images),
+            })
+
+    if results:
+        baseline = results[0]["pages_per_sec"]
+        for row in results:
+            row["speedup"] = round(row["pages_per_sec"] / baseline, 2)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"{'workers':>8} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'speedup':>8}")
+    for row in results:
+        print(f"{row['workers']:>8} {row['pages']:>6} {row['seconds']:8.2f} {row['pages_per_sec']:8.1f} {row['speedup']:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Question -> image lookup cost as the corpus grows.
+
+Compares the old linear scan over associations/images with the dict-backed
+indexes used by find_associated_image. Run from the backend directory:
+
+    python benchmarks/bench_image_lookup.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+def linear_scan_lookup(question_id, associations, images):
+    for association in associations:
+        if association["question_id"] == question_id:
+            image_id = association["image_id"]
+            for image in images:
+                if image["id"] == image_id:
+                    return image
+    return None
+
+
+def synthetic_corpus(num_questions, images_per_question=0.3, seed=0):
+    rng = random.Random(seed)
+    questions = [{"id": str(uuid.UUID(int=rng.getrandbits(128)))} for _ in range(num_questions)]
+    images = [{"id": str(uuid.UUID(int=rng.getrandbits(128)))} for _ in range(max(1, int(num_questions * images_per_question)))]
+    associations = [
+        {
+            "question_id": question["id"],
+            "image_id": rng.choice(images)["id"],
+            "similarity_score": rng.random(),
+            "association_type": "semantic"
+        }
+        for question in questions if rng.random() < 0.5
+    ]
+    return questions, images, associations
+
+
+def time_lookups(lookup, question_ids):
+    start = time.perf_counter()
+    for question_id in question_ids:
+        lookup(question_id)
+    return (time.perf_counter() - start) / len(question_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--skip-linear-above', type=int, default=100000,
+                        help='skip the linear scan for larger corpora (it is O(associations x images))')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        questions, images, associations = synthetic_corpus(size)
+        server.images_data[:] = images
+        server.question_image_associations[:] = associations
+        server.rebuild_lookup_indexes()
+
+        rng = random.Random(size)
+        question_ids = [rng.choice(questions)["id"] for _ in range(args.lookups)]
+
+        row = {"questions": size, "indexed_us": time_lookups(server.find_associated_image, question_ids) * 1e6}
+        if size <= args.skip_linear_above:
+            row["linear_us"] = time_lookups(
+                lambda qid: linear_scan_lookup(qid, associations, images), question_ids
+            ) * 1e6
+        results.append(row)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"{'questions':>10} {'indexed (us)':>14} {'linear scan (us)':>18}")
+    for row in results:
+        linear = f"{row['linear_us']:18.1f}" if "linear_us" in row else f"{'skipped':>18}"
+        print(f"{row['questions']:>10} {row['indexed_us']:14.2f} {linear}")
+
+
+if __name__ == '__main__':
+    main()
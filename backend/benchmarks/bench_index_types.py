@@ -0,0 +1,95 @@
+"""Latency, memory and recall@k of each FAISS_INDEX_TYPE against a flat baseline.
+
+Uses synthetic clustered 384-d vectors, so it needs neither the embedding
+model nor any PDFs. Run from the backend directory:
+
+    python benchmarks/bench_index_types.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import INDEX_TYPES, build_index  # noqa: E402
+
+DIM = 384
+
+
+def synthetic_vectors(num_vectors, num_clusters=256, seed=0):
+    # Unit-norm points scattered around random centroids, which is closer to
+    # sentence embeddings than uniform noise.
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((num_clusters, DIM)).astype("float32")
+    assignments = rng.integers(0, num_clusters, num_vectors)
+    vectors = centroids[assignments] + 0.5 * rng.standard_normal((num_vectors, DIM)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def measure(index, queries, k):
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query.reshape(1, -1), k)
+    per_query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    _, found = index.search(queries, k)
+    return per_query_ms, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--types', nargs='+', default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, default=16)
+    parser.add_argument('--ef-search', type=int, default=64)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        vectors = synthetic_vectors(size)
+        queries = synthetic_vectors(args.queries, seed=1)
+        flat = build_index(vectors, DIM, "flat")
+        _, truth = flat.search(queries, args.k)
+
+        for index_type in args.types:
+            start = time.perf_counter()
+            # min_train_vectors=0 so small corpora still exercise the trained types.
+            index = build_index(vectors, DIM, index_type, min_train_vectors=0,
+                                nprobe=args.nprobe, ef_search=args.ef_search)
+            build_s = time.perf_counter() - start
+            latency_ms, found = measure(index, queries, args.k)
+            results.append({
+                "vectors": size,
+                "type": index_type,
+                "build_s": round(build_s, 3),
+                "query_ms": round(latency_ms, 4),
+                "memory_mb": round(faiss.serialize_index(index).nbytes / 2**20, 2),
+                f"recall@{args.k}": round(recall_at_k(found, truth), 4),
+            })
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    recall_key = f"recall@{args.k}"
+    print(f"{'vectors':>9} {'type':>9} {'build s':>9} {'query ms':>9} {'memory MB':>10} {recall_key:>10}")
+    for row in results:
+        print(f"{row['vectors']:>9} {row['type']:>9} {row['build_s']:9.2f} {row['query_ms']:9.3f} "
+              f"{row['memory_mb']:10.1f} {row[recall_key]:10.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Explain plans and latency of the per-user MongoDB queries before and after indexing.
+
+Seeds a scratch database on a local mongod with synthetic tests and
+results, runs the queries the API issues without indexes, then creates
+the indexes from mongo_indexes.py and runs them again. The scratch
+database is dropped afterwards. Run from the backend directory:
+
+    python benchmarks/bench_mongo_indexes.py --uri mongodb://localhost:27017
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongo_indexes import ensure_indexes  # noqa: E402
+
+
+def seed(db, users, docs_per_user, seed_value=0):
+    rng = random.Random(seed_value)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    tests, results = [], []
+    for user in range(users):
+        user_id = f"user-{user}"
+        for n in range(docs_per_user):
+            created = start + timedelta(minutes=rng.randrange(500000))
+            tests.append({
+                "userId": user_id, "testType": "custom", "subjects": ["Physics"],
+                "totalQuestions": 25, "timeLimit": 60, "questions": [{"question": "x" * 200}] * 25,
+                "createdAt": created,
+            })
+            results.append({
+                "userId": user_id, "testId": str(n), "testName": "Custom Test", "subjects": ["Physics"],
+                "totalQuestions": 25, "timeTaken": rng.randrange(3600),
+                "results": {"score": rng.randrange(26), "total": 25, "percentage": rng.uniform(0, 100)},
+                "completedAt": created.isoformat(), "createdAt": created.isoformat(),
+            })
+        if len(tests) >= 5000:
+            db.tests.insert_many(tests)
+            db.test_results.insert_many(results)
+            tests, results = [], []
+    if tests:
+        db.tests.insert_many(tests)
+        db.test_results.insert_many(results)
+
+
+def plan_summary(explain):
+    # Winning plan stages from the root down, e.g. LIMIT > FETCH > IXSCAN.
+    stages = []
+    plan = explain["queryPlanner"]["winningPlan"]
+    plan = plan.get("queryPlan", plan)
+    while plan:
+        stages.append(plan["stage"])
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    stats = explain.get("executionStats", {})
+    return {
+        "plan": " > ".join(stages),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+    }
+
+
+def queries(db, user_id):
+    # The same shapes as get_test_history, get_user_test_results and get_user_stats.
+    return {
+        "test_history_list": lambda: db.tests.find(
+            {"userId": user_id}, {"questions": 0}).sort([("createdAt", -1), ("_id", -1)]).limit(21),
+        "test_results_page": lambda: db.test_results.find(
+            {"userId": user_id}).sort([("completedAt", -1), ("_id", -1)]).limit(11),
+    }
+
+
+def measure(db, user_ids, repeat):
+    rows = {}
+    for name, make_cursor in queries(db, user_ids[0]).items():
+        explain = make_cursor().explain()
+        start = time.perf_counter()
+        for i in range(repeat):
+            list(queries(db, user_ids[i % len(user_ids)])[name]())
+        rows[name] = {**plan_summary(explain), "ms": round((time.perf_counter() - start) * 1000 / repeat, 3)}
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        db.test_results.count_documents({"userId": user_ids[i % len(user_ids)]})
+    rows["count_documents"] = {"ms": round((time.perf_counter() - start) * 1000 / repeat, 3)}
+
+    def stats_pipeline(user_id):
+        return [{"$match": {"userId": user_id}}, {"$group": {"_id": "$userId", "n": {"$sum": 1}}}]
+
+    explain = db.command("aggregate", "test_results", pipeline=stats_pipeline(user_ids[0]), explain=True)
+    # Depending on the server version the plan is at the top level or under $cursor.
+    cursor_explain = (explain.get("stages") or [{}])[0].get("$cursor", explain)
+    start = time.perf_counter()
+    for i in range(repeat):
+        list(db.test_results.aggregate(stats_pipeline(user_ids[i % len(user_ids)])))
+    rows["user_stats_match"] = {
+        "plan": plan_summary(cursor_explain)["plan"] if "queryPlanner" in cursor_explain else None,
+        "ms": round((time.perf_counter() - start) * 1000 / repeat, 3),
+    }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uri', default='mongodb://localhost:27017')
+    parser.add_argument('--database', default='jeeAce_index_bench')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--docs-per-user', type=int, default=250)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    client.drop_database(args.database)
+    db = client[args.database]
+    try:
+        seed(db, args.users, args.docs_per_user)
+        user_ids = [f"user-{n}" for n in range(args.users)]
+        results = {"before": measure(db, user_ids, args.repeat)}
+        ensure_indexes(db)
+        results["after"] = measure(db, user_ids, args.repeat)
+    finally:
+        client.drop_database(args.database)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"{args.users} users x {args.docs_per_user} documents per collection")
+    for name in results["before"]:
+        for phase in ("before", "after"):
+            row = results[phase][name]
+            examined = "" if row.get("docs_examined") is None else f"  docs examined {row['docs_examined']}"
+            print(f"{name:>20} {phase:>6} {row['ms']:9.3f} ms  {row.get('plan') or ''}{examined}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Corpus regression check and throughput of the single-pass question segmenter.
+
+Every page of every PDF in --pdf-folder is segmented by both the original
+four-regex implementation and segment_questions(); the script exits with
+status 1 on the first page where the (pattern, segment) lists differ, and
+otherwise reports pages/sec for both. Run from the backend directory:
+
+    python benchmarks/bench_segmenter.py
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extraction import segment_questions  # noqa: E402
+
+LEGACY_QUESTION_PATTERNS = [
+    r'(\d+\.\s+.*?(?=\d+\.\s+|\n\n|\Z))',
+    r'(Q\d+\.\s+.*?(?=Q\d+\.\s+|\n\n|\Z))',
+    r'(\(\d+\)\s+.*?(?=\(\d+\)|\n\n|\Z))',
+    r'(Example\s+\d+.*?(?=Example\s+\d+|\n\n|\Z))',
+]
+
+
+def legacy_segments(text):
+    return [
+        (i, match)
+        for i, pattern in enumerate(LEGACY_QUESTION_PATTERNS)
+        for match in re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
+    ]
+
+
+def load_pages(pdf_folder):
+    pages = []
+    for filename in sorted(os.listdir(pdf_folder)):
+        if filename.lower().endswith('.pdf'):
+            with fitz.open(os.path.join(pdf_folder, filename)) as doc:
+                pages.extend((filename, page_num + 1, page.get_text()) for page_num, page in enumerate(doc))
+    return pages
+
+
+def adversarial_pages(count=10):
+    # Long digit runs make the legacy "\d+\." pattern retry from every digit.
+    return [("synthetic", n + 1, ("7" * 2000 + " ") * 5) for n in range(count)]
+
+
+def pages_per_sec(segment, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            segment(text)
+    return len(texts) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf-folder', default='./pdfs')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = {}
+    for corpus, pages in (("pdfs", load_pages(args.pdf_folder)), ("adversarial", adversarial_pages())):
+        for filename, page, text in pages:
+            expected, actual = legacy_segments(text), segment_questions(text)
+            if expected != actual:
+                print(f"Segment mismatch on {filename} page {page}:")
+                print(f"  legacy ({len(expected)}): {expected[:5]}")
+                print(f"  single-pass ({len(actual)}): {actual[:5]}")
+                sys.exit(1)
+
+        texts = [text for _, _, text in pages]
+        repeat = args.repeat if corpus == "pdfs" else 1
+        results[corpus] = {
+            "pages": len(texts),
+            "segments": sum(len(segment_questions(text)) for text in texts),
+            "legacy_pages_per_sec": round(pages_per_sec(legacy_segments, texts, repeat), 1),
+            "single_pass_pages_per_sec": round(pages_per_sec(segment_questions, texts, repeat), 1),
+        }
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    for corpus, row in results.items():
+        print(f"{corpus}: {row['pages']} pages, {row['segments']} segments, identical output")
+        print(f"  legacy four-regex:  {row['legacy_pages_per_sec']:10.1f} pages/sec")
+        print(f"  single-pass:        {row['single_pass_pages_per_sec']:10.1f} pages/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Cold-start profile of the server module for each embedding backend.
+
+Each measurement runs in a fresh interpreter: the time to import server
+(what the extraction workers and /api/health wait for), then to load the
+embedder, then to embed the first query, and whether torch got imported.
+Run from the backend directory:
+
+    python benchmarks/bench_startup.py --backends torch onnx onnx-int8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from embedding import EMBEDDING_BACKENDS  # noqa: E402
+
+PROFILE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter()
+server.get_embedder()
+loaded = time.perf_counter()
+server.embed_texts(["A particle moves in a circle of radius r with constant speed."])
+embedded = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "embedder_load_s": loaded - imported,
+    "first_embedding_s": embedded - loaded,
+    "total_s": embedded - start,
+    "torch_imported": "torch" in sys.modules,
+}))
+"""
+
+
+def profile(backend):
+    env = dict(os.environ, EMBEDDING_BACKEND=backend)
+    output = subprocess.run(
+        [sys.executable, "-c", PROFILE_SCRIPT], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    # server prints while importing; the profile is the last line.
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = {}
+    for backend in args.backends:
+        runs = [profile(backend) for _ in range(args.runs)]
+        results[backend] = {
+            key: round(min(run[key] for run in runs), 3)
+            for key in ("import_s", "embedder_load_s", "first_embedding_s", "total_s")
+        }
+        results[backend]["torch_imported"] = runs[-1]["torch_imported"]
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"best of {args.runs} runs, seconds")
+    print(f"{'backend':>10} {'import':>8} {'load':>8} {'first':>8} {'total':>8}  torch imported")
+    for backend, row in results.items():
+        print(f"{backend:>10} {row['import_s']:8.3f} {row['embedder_load_s']:8.3f} "
+              f"{row['first_embedding_s']:8.3f} {row['total_s']:8.3f}  {row['torch_imported']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Local stand-in for the OpenAI-style chat completions API.
+
+Answers every POST with a well-formed MCQ after a configurable delay, and
+answers a configurable fraction with HTTP 429 and a Retry-After header, so
+the server's rate limiting and retry paths run without a real provider.
+Point the server at it with GROQ_API_URL. Can be run on its own:
+
+    python benchmarks/llm_stub.py --port 8089 --latency-ms 400 --rate-limit 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            prompt = json.loads(body)["messages"][-1]["content"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            self._reply(400, {"error": {"message": "invalid request body"}})
+            return
+
+        status = stub.next_status()
+        if status == 429:
+            self._reply(429, {"error": {"message": "rate limit exceeded"}},
+                        {"Retry-After": f"{stub.retry_after:g}"})
+            return
+
+        time.sleep(stub.latency())
+        prompt_tokens = len(prompt) // 4
+        completion = stub.completion()
+        self._reply(200, {
+            "id": f"stub-{stub.requests}",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": completion}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(completion) // 4,
+                "total_tokens": prompt_tokens + len(completion) // 4,
+            },
+        })
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LLMStub:
+    """`latency_ms` +- `jitter_ms` per completion; `rate_limit` is the
+    fraction of requests answered with 429 (before any delay, as a real
+    provider rejects them up front)."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=300, jitter_ms=100, rate_limit=0.0,
+                 retry_after=1.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/openai/v1/chat/completions"
+
+    def next_status(self):
+        with self._lock:
+            self.requests += 1
+            if self._rng.random() < self.rate_limit:
+                self.rate_limited += 1
+                return 429
+            return 200
+
+    def latency(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(self.latency_ms + jitter, 0) / 1000
+
+    def completion(self):
+        with self._lock:
+            a, b = self._rng.randint(2, 99), self._rng.randint(2, 99)
+            answer = self._rng.choice("ABCD")
+        return (
+            f"Q: Which value satisfies the stated condition when the parameters are {a} and {b}?\n"
+            f"A. {a + b}\nB. {a * b}\nC. {abs(a - b)}\nD. {a + 2 * b}\n"
+            f"Answer: {answer}"
+        )
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot_stats(self):
+        with self._lock:
+            return {"requests": self.requests, "rate_limited": self.rate_limited}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--jitter-ms', type=float, default=100)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='seconds sent in the Retry-After header')
+    args = parser.parse_args()
+
+    stub = LLMStub(args.host, args.port, args.latency_ms, args.jitter_ms, args.rate_limit, args.retry_after)
+    print(f"Serving on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(stub.snapshot_stats()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Synthetic JEE-style question papers for the benchmarks.
+
+Each PDF has a subject heading per section, numbered questions ("Q1.")
+filled in from per-subject templates with random values (with
+QUESTION_DEDUP_THRESHOLD below 1.0, ingestion drops a share of them as
+near-duplicates), and a figure with a caption next to some questions.
+Every page also carries the same header logo, drawn from one shared xref
+like a real paper's letterhead.
+Can be run on its own:
+
+    python benchmarks/synthetic_pdfs.py --out /tmp/papers --pdfs 4 --pages 20
+"""
+import argparse
+import os
+import random
+
+try:
+    import pymupdf as fitz
+except ImportError:  # PyMuPDF < 1.24.3 only has the fitz name
+    import fitz
+
+SUBJECTS = {
+    "Physics": (
+        "A block of mass {a} kg slides down a rough incline of angle {b} degrees",
+        "A charged particle enters a uniform magnetic field of {a} mT with speed {b} m/s",
+        "A convex lens of focal length {a} cm forms an image of an object placed {b} cm away",
+        "A wire of resistance {a} ohm is stretched until its length increases by {b} percent",
+        "A satellite orbits the earth at a height of {a} km above a planet of radius {b} km",
+        "An ideal gas at {a} K expands adiabatically until its volume becomes {b} times larger",
+        "A string fixed at both ends vibrates in its {a}th harmonic at {b} Hz",
+        "A capacitor of {a} microfarad is charged to {b} V and then connected across an inductor",
+    ),
+    "Chemistry": (
+        "The rate constant of a first order reaction is {a} per minute at {b} K",
+        "A buffer is prepared by mixing {a} mL of acetic acid with {b} mL of sodium acetate",
+        "The standard electrode potential of a cell is {a} V when {b} moles of electrons flow",
+        "An organic compound with {a} carbon atoms gives a positive iodoform test and contains {b} oxygen atoms",
+        "The solubility product of a sparingly soluble salt is {a} x 10^-{b}",
+        "A coordination complex of cobalt has {a} ammine ligands and {b} chloride ions",
+        "The enthalpy of combustion of a hydrocarbon is -{a} kJ/mol at {b} atm",
+        "An element in period {a} of the periodic table has {b} valence electrons",
+    ),
+    "Mathematics": (
+        "The number of real roots of a polynomial of degree {a} with {b} sign changes",
+        "A matrix of order {a} has determinant {b} and is multiplied by its adjoint",
+        "The area bounded by a parabola and the line y = {a}x + {b}",
+        "A bag contains {a} red and {b} blue balls and two are drawn without replacement",
+        "The sum of the first {a} terms of an arithmetic progression with common difference {b}",
+        "The limit as x tends to zero of sin({a}x) divided by {b}x",
+        "A circle passes through the origin and has its centre on the line x + y = {a} with radius {b}",
+        "The coefficient of x^{a} in the binomial expansion of (1 + x)^{b}",
+    ),
+}
+
+CONTEXTS = (
+    "Neglect air resistance and assume standard conditions.",
+    "Give your answer to the nearest integer.",
+    "Consider only the steady state after a long time.",
+    "Assume all surfaces are ideal unless stated otherwise.",
+    "Use the data given in the accompanying figure where relevant.",
+    "Express the answer in SI units.",
+    "The system is initially at rest.",
+    "Treat all quantities as exact.",
+    "Which of the following statements is correct?",
+    "Find the value of the required quantity.",
+    "Determine the ratio of the final to the initial value.",
+    "Identify the option that best describes the result.",
+)
+
+
+def question_text(rng, subject, number):
+    template = rng.choice(SUBJECTS[subject])
+    stem = template.format(a=rng.randint(2, 99), b=rng.randint(2, 99))
+    context = " ".join(rng.sample(CONTEXTS, 2))
+    return f"Q{number}. {stem}. {context}"
+
+
+def figure_png(rng, width=240, height=160):
+    """A PNG of random coloured bars, different for every call."""
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pixmap.set_rect(pixmap.irect, (255, 255, 255))
+    x = 0
+    while x < width:
+        bar = rng.randint(6, 30)
+        top = rng.randint(0, height - 10)
+        pixmap.set_rect(fitz.IRect(x, top, x + bar, height), tuple(rng.randint(0, 220) for _ in range(3)))
+        x += bar + rng.randint(1, 8)
+    return pixmap.tobytes("png")
+
+
+def write_paper(path, pages, questions_per_page=6, figure_rate=0.3, seed=0):
+    """Write one paper; returns the number of questions and figures drawn."""
+    rng = random.Random(seed)
+    subjects = list(SUBJECTS)
+    section_pages = max(1, pages // len(subjects))
+    logo = figure_png(random.Random(-1), 60, 30)
+    logo_xref = 0
+    number = 0
+    figures = 0
+
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        if logo_xref:
+            page.insert_image(fitz.Rect(480, 20, 560, 50), xref=logo_xref)
+        else:
+            logo_xref = page.insert_image(fitz.Rect(480, 20, 560, 50), stream=logo)
+
+        y = 60
+        if page_num % section_pages == 0:
+            subject = subjects[min(page_num // section_pages, len(subjects) - 1)]
+            page.insert_text((50, y), f"Section: {subject}", fontsize=14)
+            y += 30
+
+        for _ in range(questions_per_page):
+            number += 1
+            box = fitz.Rect(50, y, 545, y + 60)
+            page.insert_textbox(box, question_text(rng, subject, number), fontsize=10)
+            y += 70
+            if rng.random() < figure_rate and y + 100 < page.rect.height - 40:
+                page.insert_image(fitz.Rect(60, y, 210, y + 100), stream=figure_png(rng))
+                page.insert_text((220, y + 50), f"Figure {number}: setup for question {number}", fontsize=9)
+                figures += 1
+                y += 110
+            if y > page.rect.height - 110:
+                break
+
+    doc.save(path)
+    doc.close()
+    return number, figures
+
+
+def write_corpus(out_dir, pdfs, pages, questions_per_page=6, figure_rate=0.3, seed=0):
+    """Write `pdfs` papers of `pages` pages each; returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(pdfs):
+        path = os.path.join(out_dir, f"synthetic_{seed}_{i:03d}.pdf")
+        write_paper(path, pages, questions_per_page, figure_rate, seed=seed * 1000 + i)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--pdfs', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--questions-per-page', type=int, default=6)
+    parser.add_argument('--figure-rate', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for path in write_corpus(args.out, args.pdfs, args.pages, args.questions_per_page, args.figure_rate, args.seed):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import hashlib
+import re
+
+import faiss
+import numpy as np
+
+# Leading question markers ("1.", "Q1.", "(1)", "Example 1") differ between the
+# overlapping extraction patterns for the same passage, so they are ignored.
+QUESTION_MARKER_RE = re.compile(r'^\s*(?:q\s*\d+\s*\.|\d+\s*\.|\(\d+\)|example\s+\d+\s*[.:]?)\s*', re.IGNORECASE)
+NON_WORD_RE = re.compile(r'\W+')
+
+
+def normalized_text_hash(text):
+    text = QUESTION_MARKER_RE.sub('', (text or '').lower())
+    text = NON_WORD_RE.sub(' ', text).strip()
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _unit(vectors):
+    vectors = np.ascontiguousarray(vectors, dtype='float32').copy()
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def near_duplicate_rows(embeddings, threshold, neighbours=8):
+    """Rows whose embedding is within `threshold` cosine of an earlier kept row.
+
+    Only the `neighbours` most similar rows are compared, which keeps this a
+    single batched search instead of a full pairwise matrix.
+    """
+    if len(embeddings) < 2:
+        return set()
+
+    unit = _unit(embeddings)
+    index = faiss.IndexFlatIP(unit.shape[1])
+    index.add(unit)
+    similarities, neighbour_rows = index.search(unit, min(neighbours, len(unit)))
+
+    dropped = set()
+    for row in range(len(unit)):
+        for similarity, other in zip(similarities[row], neighbour_rows[row]):
+            if 0 <= other < row and other not in dropped and similarity >= threshold:
+                dropped.add(row)
+                break
+    return dropped
+
+
+def corpus_duplicate_rows(embeddings, corpus_index, threshold):
+    """Rows whose nearest neighbour in `corpus_index` is within `threshold` cosine,
+    as {row: corpus row of that neighbour}.
+
+    Corpus vectors are unit-norm sentence embeddings, so squared L2 distance
+    and cosine similarity are related by d^2 = 2 - 2 * cos.
+    """
+    if len(embeddings) == 0 or corpus_index.ntotal == 0:
+        return {}
+
+    distances, neighbours = corpus_index.search(_unit(embeddings), 1)
+    max_distance = 2.0 - 2.0 * threshold
+    return {
+        row: int(neighbours[row][0]) for row in range(len(embeddings))
+        if neighbours[row][0] >= 0 and distances[row][0] <= max_distance
+    }
+
+
+def hash_distance(hash_a, hash_b):
+    """Hamming distance between two hex-encoded perceptual hashes."""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
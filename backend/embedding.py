@@ -0,0 +1,90 @@
+import numpy as np
+
+# torch: the sentence-transformers PyTorch model.
+# onnx / onnx-int8: the ONNX exports published with the model, run with
+# onnxruntime and the fast tokenizer, without importing torch at all.
+# tokenizers and huggingface_hub come with sentence-transformers.
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+ONNX_MODEL_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_quint8_avx2.onnx",
+}
+
+
+class TorchEmbedder:
+    def __init__(self, model_name):
+        # Imported here: torch and transformers take seconds to import.
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, batch_size=32):
+        embeddings = self.model.encode(
+            list(texts), batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False
+        )
+        return np.ascontiguousarray(embeddings, dtype='float32')
+
+
+class OnnxEmbedder:
+    """Mean-pooled, L2-normalized sentence embeddings from an ONNX export.
+
+    Reproduces the Transformer -> Pooling(mean) -> Normalize pipeline of
+    the sentence-transformers MiniLM models, so the vectors match the torch
+    backend to within float (or int8 quantization) error.
+    """
+
+    def __init__(self, model_name, model_file, max_seq_length=256, threads=0):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(repo_id, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            hf_hub_download(repo_id, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def encode(self, texts, batch_size=32):
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.session.get_outputs()[0].shape[-1]), dtype='float32')
+        # Batches of similar length waste less work on padding, as in
+        # SentenceTransformer.encode; rows are put back in input order.
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.vstack([
+            self._encode_batch([texts[i] for i in order[start:start + batch_size]])
+            for start in range(0, len(texts), batch_size)
+        ])
+        result = np.empty_like(embeddings, dtype='float32')
+        result[order] = embeddings
+        return result
+
+
+def load_embedder(model_name, backend="torch", onnx_file=None, threads=0):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBEDDING_BACKENDS}")
+    if backend == "torch":
+        return TorchEmbedder(model_name)
+    return OnnxEmbedder(model_name, onnx_file or ONNX_MODEL_FILES[backend], threads=threads)
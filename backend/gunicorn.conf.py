@@ -0,0 +1,67 @@
+# Production serving: several workers share one corpus. Start from the
+# backend directory with
+#
+#     gunicorn -c gunicorn.conf.py server:app
+#
+# Before any worker starts, `manage.py build-snapshot` ingests new or changed
+# PDFs and publishes a snapshot generation. Workers then memory-map that
+# generation read-only: the vectors and the codes of every FAISS index type,
+# including the per-subject partitions, are in the page cache once however
+# many workers run (see snapshot.read_index for the small parts that are not).
+# The JSON metadata is still parsed into each worker, and each worker loads
+# its own embedding model (ONNX by default, see below). Each worker switches to
+# a newer generation within GENERATION_CHECK_INTERVAL seconds of it being
+# published; the worker that ingests an upload holds a private copy of the
+# indexes until it has published it.
+# An upload is ingested by the worker that received it, under a file lock,
+# and published as the next generation.
+#
+# Rate limits (GROQ_*_PER_MINUTE, QUESTION_POOL_REQUESTS_PER_MINUTE) and the
+# question pool are per worker; divide the provider budget accordingly.
+import os
+import shutil
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+# Threads keep streaming responses and slow LLM calls from blocking a worker.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+# Each worker imports the app itself: the embedding model and FAISS do not
+# survive fork, and the shared state is the snapshot on disk anyway.
+preload_app = False
+
+os.environ.setdefault('SERVING_MODE', 'shared')
+# Every worker loads its own embedder, so this is paid WEB_CONCURRENCY
+# times: the ONNX backend keeps torch out of the workers (a few hundred MB
+# each). Without onnxruntime installed a worker falls back to torch.
+os.environ.setdefault('EMBEDDING_BACKEND', 'onnx')
+# Workers write their metrics here and /metrics on any worker aggregates
+# them. Must be set before a worker imports prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/jeeace-metrics')
+
+
+def on_starting(server):
+    # Files left by a previous run would be merged into this run's metrics.
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    # A separate process, so the master never loads the corpus or the model.
+    subprocess.run(
+        [sys.executable, 'manage.py', 'build-snapshot'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+    )
+
+
+def post_worker_init(worker):
+    import server as app_module
+
+    app_module.start_background_services()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,76 @@
+"""Maintenance commands for the backend's MongoDB collections.
+
+Run from the backend directory:
+
+    python manage.py ensure-indexes
+    python manage.py verify-indexes
+    python manage.py backfill-stats [--user-id UID]
+    python manage.py build-snapshot
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from mongo_indexes import ensure_indexes, verify_indexes
+from user_stats import backfill_user_stats
+
+
+def get_db():
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+    return MongoClient(os.getenv('MONGODB_URI'))['jeeAce']
+
+
+def cmd_ensure_indexes(args):
+    created = ensure_indexes(get_db())
+    if not created:
+        print("All indexes already exist")
+    for collection, names in created.items():
+        print(f"Created on {collection}: {', '.join(names)}")
+    return 0
+
+
+def cmd_verify_indexes(args):
+    problems = verify_indexes(get_db())
+    for problem in problems:
+        print(problem)
+    if not problems:
+        print("All indexes present")
+    return 1 if problems else 0
+
+
+def cmd_backfill_stats(args):
+    users = backfill_user_stats(get_db(), user_id=args.user_id)
+    print(f"Rebuilt stats rollups for {users} users")
+    return 0
+
+
+def cmd_build_snapshot(args):
+    # This process ingests on its own behalf; the lock it takes keeps shared-mode
+    # workers from publishing at the same time.
+    os.environ['SERVING_MODE'] = 'standalone'
+    import server
+
+    server.build_snapshot()
+    print(f"Current snapshot generation: {server.corpus_generation}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('ensure-indexes', help='create missing MongoDB indexes').set_defaults(func=cmd_ensure_indexes)
+    commands.add_parser('verify-indexes', help='exit 1 if an index is missing or differs').set_defaults(func=cmd_verify_indexes)
+    backfill = commands.add_parser('backfill-stats', help='rebuild user_stats rollups from test_results')
+    backfill.add_argument('--user-id', help='only rebuild this user')
+    backfill.set_defaults(func=cmd_backfill_stats)
+    commands.add_parser('build-snapshot', help='ingest new or changed PDFs and publish a snapshot generation') \
+        .set_defaults(func=cmd_build_snapshot)
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
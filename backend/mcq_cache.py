@@ -0,0 +1,115 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def mcq_cache_key(text, subject, model, prompt_version):
+    payload = "\0".join([str(prompt_version), model or "", subject or "", text or ""])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MCQCache:
+    """Two-tier cache of generated MCQs keyed by mcq_cache_key().
+
+    The in-memory tier is an LRU bounded by `memory_entries`; the optional
+    SQLite tier at `db_path` survives restarts and is shared by every process
+    on the host. Entries older than `ttl_seconds` are treated as misses, and
+    the SQLite tier is trimmed to `max_entries` least recently used rows.
+    """
+
+    def __init__(self, db_path=None, memory_entries=2048, max_entries=50000, ttl_seconds=30 * 24 * 3600):
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bypassed": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS mcq_cache ("
+                "key TEXT PRIMARY KEY, mcq TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS mcq_cache_accessed_at ON mcq_cache (accessed_at)")
+            self._db.commit()
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds and now - created_at > self.ttl_seconds
+
+    def _remember(self, key, mcq, created_at):
+        self._memory[key] = (mcq, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and not self._expired(entry[1], now):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT mcq, created_at FROM mcq_cache WHERE key = ?", (key,)).fetchone()
+                if row and not self._expired(row[1], now):
+                    self._db.execute("UPDATE mcq_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    mcq = json.loads(row[0])
+                    self._remember(key, mcq, row[1])
+                    self.stats["disk_hits"] += 1
+                    return mcq
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, mcq):
+        now = time.time()
+        with self._lock:
+            self._remember(key, mcq, now)
+            self.stats["stores"] += 1
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO mcq_cache (key, mcq, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(mcq), now, now)
+            )
+            self._writes_since_trim += 1
+            if self._writes_since_trim >= 100:
+                self._trim(now)
+            self._db.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats["bypassed"] += 1
+
+    def _trim(self, now):
+        self._writes_since_trim = 0
+        if self.ttl_seconds:
+            cursor = self._db.execute("DELETE FROM mcq_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.stats["evictions"] += cursor.rowcount
+        cursor = self._db.execute(
+            "DELETE FROM mcq_cache WHERE key IN ("
+            "SELECT key FROM mcq_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.stats["evictions"] += cursor.rowcount
+
+    def snapshot_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,65 @@
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from pymongo import monitoring
+
+# Under gunicorn every worker records into files in PROMETHEUS_MULTIPROC_DIR
+# (set in gunicorn.conf.py) and a scrape of any worker merges them all.
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+# Seconds; spans cache hits and FAISS searches (sub-millisecond) up to LLM
+# calls and whole-page extraction.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    'jeeace_stage_seconds', 'Latency of each processing stage', ['stage'], buckets=LATENCY_BUCKETS
+)
+MONGO_SECONDS = Histogram(
+    'jeeace_mongo_command_seconds', 'Latency of MongoDB commands', ['command', 'outcome'], buckets=LATENCY_BUCKETS
+)
+
+LLM_REQUESTS = Counter('jeeace_llm_requests_total', 'LLM API responses by status', ['status'])
+LLM_RETRIES = Counter('jeeace_llm_retries_total', 'LLM calls retried after a 429 or an error')
+LLM_RATE_LIMITED = Counter('jeeace_llm_rate_limited_total', 'LLM calls answered with HTTP 429')
+MCQ_PARSE_FAILURES = Counter('jeeace_mcq_parse_failures_total', 'LLM responses that did not parse into a valid MCQ')
+QUESTIONS_SERVED = Counter('jeeace_questions_served_total', 'Generated questions returned to clients', ['source'])
+
+CORPUS_SIZE = Gauge(
+    'jeeace_corpus_items', 'Items in the served corpus', ['kind'], multiprocess_mode='livemax'
+)
+
+# Children are bound once here so the hot paths skip .labels(), which takes
+# a lock and a dict lookup; observing is then a lock-protected add.
+PDF_PAGE = STAGE_SECONDS.labels('pdf_extract_page')
+EMBED_BATCH = STAGE_SECONDS.labels('embed_batch')
+INDEX_ADD = STAGE_SECONDS.labels('index_add')
+INDEX_SEARCH = STAGE_SECONDS.labels('index_search')
+LLM_RATE_LIMIT_WAIT = STAGE_SECONDS.labels('llm_rate_limit_wait')
+LLM_REQUEST = STAGE_SECONDS.labels('llm_request')
+MCQ_PARSE = STAGE_SECONDS.labels('mcq_parse')
+IMAGE_LOAD = STAGE_SECONDS.labels('image_load')
+POOL_QUESTIONS = QUESTIONS_SERVED.labels('pool')
+LIVE_QUESTIONS = QUESTIONS_SERVED.labels('live')
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command from the driver's own monitoring events."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_SECONDS.labels(event.command_name, 'ok').observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_SECONDS.labels(event.command_name, 'error').observe(event.duration_micros / 1e6)
+
+
+def render_metrics():
+    """Return (body, content_type) for a /metrics response."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,45 @@
+from pymongo import ASCENDING, DESCENDING
+
+# collection -> indexes the API's queries rely on. Every per-user query
+# filters on userId and sorts newest first on a timestamp, with _id as the
+# tie-breaker used by the keyset cursors, so one compound index per
+# collection serves the filter, the sort and count_documents.
+MONGO_INDEXES = {
+    "tests": [
+        {"name": "userId_createdAt", "keys": [("userId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]},
+    ],
+    "test_results": [
+        {"name": "userId_completedAt", "keys": [("userId", ASCENDING), ("completedAt", DESCENDING), ("_id", DESCENDING)]},
+    ],
+}
+
+
+def ensure_indexes(db):
+    """Create any missing index; returns {collection: [index names created]}.
+
+    create_index is a no-op for an index that already exists with the same
+    keys and name, so this is safe to run on every start.
+    """
+    created = {}
+    for collection_name, indexes in MONGO_INDEXES.items():
+        collection = db[collection_name]
+        existing = set(collection.index_information())
+        for index in indexes:
+            if index["name"] not in existing:
+                collection.create_index(index["keys"], name=index["name"])
+                created.setdefault(collection_name, []).append(index["name"])
+    return created
+
+
+def verify_indexes(db):
+    """Return a list of problems: missing indexes or ones with other keys."""
+    problems = []
+    for collection_name, indexes in MONGO_INDEXES.items():
+        info = db[collection_name].index_information()
+        for index in indexes:
+            current = info.get(index["name"])
+            if current is None:
+                problems.append(f"{collection_name}.{index['name']} is missing")
+            elif [tuple(key) for key in current["key"]] != [tuple(key) for key in index["keys"]]:
+                problems.append(f"{collection_name}.{index['name']} has keys {current['key']}, expected {index['keys']}")
+    return problems
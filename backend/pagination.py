@@ -0,0 +1,65 @@
+import base64
+
+from bson import json_util
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(document, field):
+    # json_util keeps datetimes and ObjectIds typed, so the decoded cursor
+    # compares against stored values exactly as the sort did.
+    payload = json_util.dumps([document.get(field), document["_id"]])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return (sort_value, _id) from a cursor, or raise ValueError."""
+    try:
+        sort_value, last_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return sort_value, last_id
+
+
+def keyset_filter(field, cursor):
+    """Documents after `cursor` in descending (field, _id) order.
+
+    Documents without `field` sort after every document that has one, so
+    they are still reached once the cursor moves past the last dated one.
+    """
+    sort_value, last_id = decode_cursor(cursor)
+    if sort_value is None:
+        return {field: None, "_id": {"$lt": last_id}}
+    return {"$or": [
+        {field: {"$lt": sort_value}},
+        {field: sort_value, "_id": {"$lt": last_id}},
+        {field: None},
+    ]}
+
+
+def keyset_page(collection, query, field, cursor=None, limit=DEFAULT_PAGE_SIZE, projection=None):
+    """Fetch one page sorted newest first by (field, _id).
+
+    Returns (documents, next_cursor); next_cursor is None on the last page.
+    One extra document is read to tell whether another page exists.
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(field, cursor)]}
+    documents = list(
+        collection.find(query, projection)
+        .sort([(field, -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor(documents[-1], field)
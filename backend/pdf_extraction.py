@@ -0,0 +1,402 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+import fitz
+from PIL import Image as PILImage
+
+# Worker processes are started with "spawn": the server process runs Flask,
+# the MCQ threads and the embedding model, and forking it is not safe.
+_pool = None
+_pool_workers = 0
+
+IMAGE_MIME_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "jpx": "image/jp2",
+    "jp2": "image/jp2",
+    "gif": "image/gif",
+    "bmp": "image/bmp",
+    "tif": "image/tiff",
+    "tiff": "image/tiff",
+    "webp": "image/webp",
+}
+
+
+def detect_subject(lower_text):
+    if "physics" in lower_text:
+        return "Physics"
+    elif "chemistry" in lower_text:
+        return "Chemistry"
+    elif "math" in lower_text or "mathematics" in lower_text:
+        return "Mathematics"
+    elif "biology" in lower_text:
+        return "Biology"
+    return None
+
+
+# One scan finds every question marker and paragraph break. Each alternative
+# consumes at most its first characters, so overlapping markers ("Q1." is
+# also a "1." marker) are all reported, and a digit run is only tried from
+# its first digit, so long numbers cannot trigger quadratic backtracking.
+# The *_body lookahead groups end where the original pattern's greedy
+# prefix ended, i.e. where the question body starts. Case is spelled out
+# rather than using IGNORECASE so the leading character class lets the
+# scanner skip ordinary text quickly.
+MARKER_RE = re.compile(
+    r'(?=[qQ\d(eE\n])(?:'
+    r'(?P<q>[qQ](?=(?P<q_body>\d+\.\s+)))'
+    r'|(?P<num>\d(?<!\d\d)\d*\.(?=(?P<num_body>\s+)))'
+    r'|(?P<paren>\(\d+\)(?=(?P<paren_body>\s+))?)'
+    r'|(?P<example>[eE][xX][aA][mM][pP][lL][eE](?=(?P<example_body>\s+\d+)))'
+    r'|(?P<nn>\n(?=\n)))'
+)
+
+# Marker kinds in extraction_pattern order: "1.", "Q1.", "(1)", "Example 1".
+MARKER_KINDS = ("num", "q", "paren", "example")
+
+
+def tokenize_question_markers(text):
+    # kind -> positions where that marker type ends a segment, and
+    # kind -> (start, body) pairs where it can begin one. Only "(1)" differs:
+    # it needs trailing whitespace to start a segment but not to end one.
+    stops = {kind: [] for kind in MARKER_KINDS + ("nn",)}
+    starts = {kind: [] for kind in MARKER_KINDS}
+    for match in MARKER_RE.finditer(text):
+        kind = match.lastgroup
+        stops[kind].append(match.start())
+        if kind != "nn":
+            body = match.end(f"{kind}_body")
+            if body >= 0:
+                starts[kind].append((match.start(), body))
+    return starts, stops
+
+
+def segment_questions(text):
+    """Return (pattern_index, segment) for every question marker type.
+
+    A segment runs from a marker to the next marker of the same type, a
+    blank line, or the end of the text - the same slices the original
+    per-type non-greedy regexes produced - but the text is tokenized once
+    and each type is then sliced with forward-only pointers.
+    """
+    starts, stops = tokenize_question_markers(text)
+    segments = []
+
+    for pattern_index, kind in enumerate(MARKER_KINDS):
+        if not starts[kind]:
+            continue
+        boundaries = sorted(stops[kind] + stops["nn"])
+        boundaries.append(len(text))
+
+        b = 0
+        pos = 0
+        for start, body in starts[kind]:
+            # Markers inside the previous segment's body were never seen
+            # by the original scan, which resumed at that segment's end.
+            if start < pos:
+                continue
+            b = bisect_left(boundaries, body, b)
+            end = boundaries[b]
+            segments.append((pattern_index, text[start:end]))
+            pos = end
+
+    return segments
+
+
+def extract_questions_from_text(text, page_num, filename, subject):
+    questions = []
+
+    for i, segment in segment_questions(text):
+        if len(segment.strip()) > 50:
+            question_data = {
+                "id": str(uuid.uuid4()),
+                "text": segment.strip(),
+                "page": page_num + 1,
+                "source_pdf": filename,
+                "subject": subject,
+                "extraction_pattern": i,
+                "word_count": len(segment.split())
+            }
+            questions.append(question_data)
+
+    return questions
+
+
+class PageWordIndex:
+    """The words of one page, indexed for caption lookups around images.
+
+    A word is near an image when any of its edges is within the threshold
+    of the facing image edge (left vs right, top vs bottom, ...). Each of
+    those four conditions is a range query on one coordinate, so the words
+    are kept sorted by each of x0, y0, x1 and y1 and queried by bisection.
+    """
+
+    # (word edge, image edge it is compared with), as indexes into x0, y0, x1, y1
+    EDGE_PAIRS = ((0, 2), (2, 0), (1, 3), (3, 1))
+
+    def __init__(self, words):
+        self.words = words
+        self._sorted_edges = {}
+        for word_edge, _ in self.EDGE_PAIRS:
+            order = sorted(range(len(words)), key=lambda i: words[i][word_edge])
+            self._sorted_edges[word_edge] = ([words[i][word_edge] for i in order], order)
+
+    def _within(self, word, img_coords, distance_threshold):
+        return min(
+            abs(word[word_edge] - img_coords[img_edge]) for word_edge, img_edge in self.EDGE_PAIRS
+        ) <= distance_threshold
+
+    def near(self, img_rect, distance_threshold):
+        img_coords = (img_rect.x0, img_rect.y0, img_rect.x1, img_rect.y1)
+        # Bands are widened slightly and re-checked exactly below, so float
+        # rounding at the boundary cannot change which words are picked.
+        slack = distance_threshold + 1e-6
+        candidates = set()
+        for word_edge, img_edge in self.EDGE_PAIRS:
+            keys, order = self._sorted_edges[word_edge]
+            centre = img_coords[img_edge]
+            candidates.update(order[bisect_left(keys, centre - slack):bisect_right(keys, centre + slack)])
+
+        return [
+            self.words[i][4] for i in sorted(candidates)
+            if self._within(self.words[i], img_coords, distance_threshold)
+        ]
+
+
+def extract_text_near_image(page_words, img_rect, distance_threshold=100):
+    return " ".join(page_words.near(img_rect, distance_threshold))
+
+
+def write_thumbnail(image_bytes, content_hash, variants_dir, max_size):
+    # Thumbnails are content-addressed too, so re-extracting the same image
+    # never re-encodes it.
+    thumb_path = os.path.join(variants_dir, f"{content_hash}_thumb.webp")
+    if not os.path.exists(thumb_path):
+        with PILImage.open(BytesIO(image_bytes)) as img:
+            img.thumbnail((max_size, max_size))
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            # Unique per writer: ingest threads of one process can store the
+            # same content hash at the same time.
+            tmp_path = f"{thumb_path}.{uuid.uuid4().hex}.tmp"
+            img.save(tmp_path, "WEBP", quality=80)
+            os.replace(tmp_path, thumb_path)
+    else:
+        # The startup sweep only removes files older than the last published
+        # generation; a reused file is as new as the upload reusing it.
+        os.utime(thumb_path)
+    return thumb_path
+
+
+def perceptual_hash(image_bytes, hash_size=8):
+    # dHash: one bit per horizontally adjacent pixel pair of a tiny grayscale
+    # copy, so re-encoded or slightly rescaled copies land a few bits apart.
+    with PILImage.open(BytesIO(image_bytes)) as img:
+        small = img.convert("L").resize((hash_size + 1, hash_size))
+        pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            offset = row * (hash_size + 1) + col
+            bits = (bits << 1) | (pixels[offset] > pixels[offset + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def store_image(doc, xref, output_dir, thumbnail_size=None):
+    """Write an embedded image under its content hash and describe the file.
+
+    Identical bytes from any page or document map to the same file, which is
+    only written the first time it is seen.
+    """
+    base_image = doc.extract_image(xref)
+    image_bytes = base_image["image"]
+    image_ext = base_image["ext"]
+    content_hash = hashlib.sha256(image_bytes).hexdigest()
+
+    image_path = os.path.join(output_dir, f"{content_hash}.{image_ext}")
+    if not os.path.exists(image_path):
+        tmp_path = f"{image_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(image_bytes)
+        os.replace(tmp_path, image_path)
+    else:
+        os.utime(image_path)
+
+    variants = {}
+    phash = None
+    try:
+        phash = perceptual_hash(image_bytes)
+        if thumbnail_size:
+            variants["thumb"] = write_thumbnail(
+                image_bytes, content_hash, os.path.join(output_dir, "variants"), thumbnail_size
+            )
+    except Exception as e:
+        # Some PDF-native formats (e.g. JBIG2) cannot be decoded by Pillow.
+        print(f"Could not decode image {content_hash[:12]}: {e}")
+
+    return {
+        "image_path": image_path,
+        "content_hash": content_hash,
+        "perceptual_hash": phash,
+        "mime_type": IMAGE_MIME_TYPES.get(image_ext.lower(), "application/octet-stream"),
+        "variants": variants,
+    }
+
+
+def extract_page(doc, page_num, filename, output_dir, thumbnail_size=None, xref_cache=None):
+    # Subjects are left unset here: the subject carries over from earlier
+    # pages, so it is resolved once all pages are back in order.
+    start = time.perf_counter()
+    page = doc[page_num]
+    text = page.get_text()
+
+    questions = extract_questions_from_text(text, page_num, filename, None)
+    images = []
+    page_words = None
+    if xref_cache is None:
+        xref_cache = {}
+
+    for img in page.get_images(full=True):
+        xref = img[0]
+        # A logo or header is one xref drawn on many pages; extract it once.
+        if xref not in xref_cache:
+            xref_cache[xref] = store_image(doc, xref, output_dir, thumbnail_size)
+        stored = xref_cache[xref]
+
+        img_rect = fitz.Rect(img[1:5])
+
+        if page_words is None:
+            # Extracted once per page, and only for pages that have images.
+            page_words = PageWordIndex(page.get_text("words"))
+        nearby_text = extract_text_near_image(page_words, img_rect, distance_threshold=100)
+
+        images.append({
+            "id": str(uuid.uuid4()),
+            **stored,
+            "variants": dict(stored["variants"]),
+            "page": page_num + 1,
+            "source_pdf": filename,
+            "subject": None,
+            "position": {
+                "x": img_rect.x0,
+                "y": img_rect.y0,
+                "width": img_rect.width,
+                "height": img_rect.height
+            },
+            "caption": nearby_text,
+            "surrounding_text": text
+        })
+
+    return {
+        "page": page_num + 1,
+        "subject_hint": detect_subject(text.lower()),
+        "questions": questions,
+        "images": images,
+        # Measured in whichever process extracted the page; the caller
+        # records it, since worker processes have no metrics of their own.
+        "seconds": time.perf_counter() - start
+    }
+
+
+def extract_page_range(pdf_path, output_dir, start, stop, filename=None, thumbnail_size=None):
+    filename = filename or os.path.basename(pdf_path)
+    doc = fitz.open(pdf_path)
+    xref_cache = {}
+    try:
+        return [
+            extract_page(doc, page_num, filename, output_dir, thumbnail_size, xref_cache)
+            for page_num in range(start, min(stop, len(doc)))
+        ]
+    finally:
+        doc.close()
+
+
+def page_count(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def get_extraction_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _pool_workers = workers
+    return _pool
+
+
+def resolve_subjects(pages):
+    current_subject = None
+    for page in pages:
+        current_subject = page["subject_hint"] or current_subject
+        for item in page["questions"] + page["images"]:
+            item["subject"] = current_subject
+
+
+def extract_pdf_pages(pdf_path, output_dir, workers=1, chunk_pages=16, progress=None, thumbnail_size=None,
+                      page_timer=None):
+    """Extract questions and images from every page of a PDF.
+
+    With workers > 1 and more than one chunk of pages, page ranges of
+    `chunk_pages` are extracted in separate processes, each with its own
+    fitz handle, and merged back in page order. With `thumbnail_size`, a
+    WebP thumbnail no larger than that many pixels is written per image.
+
+    Every occurrence of an image gets its own record (the caption depends on
+    where it is drawn), but records of identical bytes share one file.
+
+    `page_timer`, if given, is called in this process with the extraction
+    time in seconds of each page.
+    """
+    if thumbnail_size:
+        os.makedirs(os.path.join(output_dir, "variants"), exist_ok=True)
+    filename = os.path.basename(pdf_path)
+    total_pages = page_count(pdf_path)
+    pages = []
+
+    def report(new_pages):
+        if page_timer:
+            for page in new_pages:
+                page_timer(page["seconds"])
+        if progress:
+            progress(
+                len(pages), total_pages,
+                sum(len(p["questions"]) for p in pages),
+                sum(len(p["images"]) for p in pages)
+            )
+
+    if workers <= 1 or total_pages <= chunk_pages:
+        doc = fitz.open(pdf_path)
+        xref_cache = {}
+        try:
+            for page_num in range(total_pages):
+                pages.append(extract_page(doc, page_num, filename, output_dir, thumbnail_size, xref_cache))
+                report(pages[-1:])
+        finally:
+            doc.close()
+    else:
+        pool = get_extraction_pool(workers)
+        futures = [
+            pool.submit(extract_page_range, pdf_path, output_dir, start, start + chunk_pages, filename, thumbnail_size)
+            for start in range(0, total_pages, chunk_pages)
+        ]
+        for future in as_completed(futures):
+            chunk = future.result()
+            pages.extend(chunk)
+            report(chunk)
+        pages.sort(key=lambda p: p["page"])
+
+    resolve_subjects(pages)
+
+    extracted_questions = [q for page in pages for q in page["questions"]]
+    extracted_images = [img for page in pages for img in page["images"]]
+    return extracted_questions, extracted_images
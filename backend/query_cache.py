@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_query(text):
+    return " ".join((text or "").lower().split())
+
+
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def snapshot_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class QueryCache:
+    """Caches for topic searches: normalized query -> embedding, and
+    (query, subject, k) -> search results.
+
+    Embeddings only depend on the model, so they stay valid; results depend
+    on the question index and are dropped by invalidate_results() whenever
+    it changes. Time spent encoding misses is tracked so the stats can
+    estimate how much model time the hits saved.
+    """
+
+    def __init__(self, embed_fn, embedding_entries=1024, result_entries=4096):
+        self.embed_fn = embed_fn
+        self.embeddings = LRUCache(embedding_entries)
+        self.results = LRUCache(result_entries)
+        self.invalidations = 0
+        self._encode_seconds = 0.0
+        self._encoded = 0
+        self._lock = threading.Lock()
+
+    def embedding(self, query):
+        key = normalize_query(query)
+        with self._lock:
+            vector = self.embeddings.get(key)
+        if vector is not None:
+            return vector
+
+        start = time.perf_counter()
+        vector = self.embed_fn([key])
+        with self._lock:
+            self._encode_seconds += time.perf_counter() - start
+            self._encoded += 1
+            self.embeddings.put(key, vector)
+        return vector
+
+    def warm(self, queries, batch_size=64):
+        """Embed `queries` in batches ahead of time; returns how many were new."""
+        with self._lock:
+            pending = list(dict.fromkeys(
+                key for key in map(normalize_query, queries) if key and key not in self.embeddings._entries
+            ))
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            vectors = self.embed_fn(batch)
+            with self._lock:
+                for key, vector in zip(batch, vectors):
+                    self.embeddings.put(key, vector.reshape(1, -1))
+        return len(pending)
+
+    # Result lookups and stores are made while the caller holds the lock
+    # that guards the question index, so a store can never race an
+    # invalidation and leave results from an older index behind.
+    def get_results(self, query, subject, k):
+        with self._lock:
+            return self.results.get((normalize_query(query), subject, k))
+
+    def put_results(self, query, subject, k, results):
+        with self._lock:
+            self.results.put((normalize_query(query), subject, k), results)
+
+    def invalidate_results(self):
+        with self._lock:
+            self.results.clear()
+            self.invalidations += 1
+
+    def snapshot_stats(self):
+        with self._lock:
+            per_encode = self._encode_seconds / self._encoded if self._encoded else 0.0
+            return {
+                "embeddings": self.embeddings.snapshot_stats(),
+                "results": self.results.snapshot_stats(),
+                "result_invalidations": self.invalidations,
+                # A result hit skips the encode as well.
+                "model_seconds_saved": round((self.embeddings.hits + self.results.hits) * per_encode, 3),
+            }
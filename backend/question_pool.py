@@ -0,0 +1,144 @@
+import threading
+from collections import deque
+
+
+class QuestionPool:
+    """Warm per-subject (and optionally per-topic) pools of validated MCQs.
+
+    A daemon thread refills any pool that drops below `low_watermark` back
+    up to `high_watermark`, calling `generate_fn(question_data)` on passages
+    picked by `source_fn(subject, topic, n, exclude_ids)`. Every generation
+    first takes a permit from `limiter`, so pre-generation can be given a
+    smaller slice of the provider budget than live requests.
+    """
+
+    def __init__(self, source_fn, generate_fn, validate_fn, limiter,
+                 low_watermark=5, high_watermark=15, max_keys=64, idle_interval=30.0):
+        self.source_fn = source_fn
+        self.generate_fn = generate_fn
+        self.validate_fn = validate_fn
+        self.limiter = limiter
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.max_keys = max_keys
+        self.idle_interval = idle_interval
+
+        self._pools = {}
+        self._filling = set()
+        self._exhausted = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"served": 0, "shortfall": 0, "generated": 0, "failed": 0}
+
+    @staticmethod
+    def key(subject, topic=None):
+        return (subject or "All", (topic or "").strip().lower() or None)
+
+    def register(self, subject, topic=None):
+        key = self.key(subject, topic)
+        with self._lock:
+            if key not in self._pools and len(self._pools) < self.max_keys:
+                self._pools[key] = deque()
+        self._wake.set()
+
+    def take(self, subject, topic, count):
+        key = self.key(subject, topic)
+        taken = []
+        with self._lock:
+            pool = self._pools.get(key)
+            while pool and len(taken) < count:
+                taken.append(pool.popleft())
+            self.stats["served"] += len(taken)
+            self.stats["shortfall"] += count - len(taken)
+        # Demand for a key we are not warming yet registers it for next time.
+        self.register(subject, topic)
+        return taken
+
+    def refresh(self):
+        # New material may unblock pools that previously ran out of passages.
+        with self._lock:
+            self._exhausted.clear()
+        self._wake.set()
+
+    def depths(self):
+        with self._lock:
+            return {
+                f"{subject}/{topic}" if topic else subject: len(pool)
+                for (subject, topic), pool in self._pools.items()
+            }
+
+    def snapshot_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["depth"] = self.depths()
+        return stats
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="question-pool", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _next_key(self):
+        with self._lock:
+            for key, pool in self._pools.items():
+                if key in self._exhausted:
+                    continue
+                if len(pool) < self.low_watermark:
+                    self._filling.add(key)
+                if key in self._filling:
+                    if len(pool) < self.high_watermark:
+                        return key
+                    self._filling.discard(key)
+        return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            key = self._next_key()
+            if key is None:
+                self._wake.wait(self.idle_interval)
+                self._wake.clear()
+                continue
+            try:
+                self._refill(key)
+            except Exception as e:
+                print(f"Error refilling question pool {key}: {e}")
+                with self._lock:
+                    self._exhausted.add(key)
+
+    def _refill(self, key):
+        subject, topic = key
+        with self._lock:
+            pool = self._pools[key]
+            needed = self.high_watermark - len(pool)
+            pooled_ids = {question_data["id"] for question_data, _ in pool}
+
+        candidates = self.source_fn(subject, topic, needed, pooled_ids)
+        if not candidates:
+            with self._lock:
+                self._exhausted.add(key)
+            return
+
+        added = 0
+        for question_data in candidates:
+            if self._stop.is_set() or added >= needed:
+                break
+            self.limiter.acquire()
+            mcq = self.generate_fn(question_data)
+            with self._lock:
+                if self.validate_fn(mcq):
+                    pool.append((question_data, mcq))
+                    self.stats["generated"] += 1
+                    added += 1
+                else:
+                    self.stats["failed"] += 1
+
+        if not added:
+            # Every candidate failed; back off until new material arrives.
+            with self._lock:
+                self._exhausted.add(key)
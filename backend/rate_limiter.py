@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class TokenBucketLimiter:
+    """Process-wide limiter for a provider's requests- and tokens-per-minute budget.
+
+    Every caller shares the same two buckets, so concurrent requests together
+    stay under the budget. A 429 pauses the whole bucket instead of each
+    caller backing off on its own.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._request_allowance = self.requests_per_minute
+        self._token_allowance = self.tokens_per_minute
+        self._updated_at = clock()
+        self._paused_until = 0.0
+        self.throttled_calls = 0
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated_at)
+        self._updated_at = now
+        self._request_allowance = min(
+            self.requests_per_minute, self._request_allowance + elapsed * self.requests_per_minute / 60.0
+        )
+        self._token_allowance = min(
+            self.tokens_per_minute, self._token_allowance + elapsed * self.tokens_per_minute / 60.0
+        )
+
+    def _wait_time(self, now, tokens):
+        if now < self._paused_until:
+            return self._paused_until - now
+        waits = [0.0]
+        if self._request_allowance < 1:
+            waits.append((1 - self._request_allowance) * 60.0 / self.requests_per_minute)
+        if self._token_allowance < tokens:
+            waits.append((tokens - self._token_allowance) * 60.0 / self.tokens_per_minute)
+        return max(waits)
+
+    def acquire(self, tokens=0):
+        # A single call larger than the whole budget would otherwise wait forever.
+        tokens = min(float(tokens), self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    self._request_allowance -= 1
+                    self._token_allowance -= tokens
+                    return
+            self._sleep(wait)
+
+    def adjust(self, tokens):
+        """Charge (positive) or refund (negative) tokens once actual usage is known."""
+        with self._lock:
+            self._refill(self._clock())
+            self._token_allowance = min(self.tokens_per_minute, self._token_allowance - tokens)
+
+    def penalize(self, retry_after):
+        """Stop handing out permits for `retry_after` seconds after the provider returned 429."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + retry_after)
+            self._request_allowance = min(self._request_allowance, 0.0)
+            self.throttled_calls += 1
@@ -1,24 +1,35 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, send_file
 from flask_cors import CORS
-import fitz
 import os
 import time
 import numpy as np
-import faiss
 import uuid
+import random
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timezone
 import base64
-from io import BytesIO
-from sentence_transformers import SentenceTransformer
-from PIL import Image as PILImage
 import requests
 import re
 from dotenv import load_dotenv
-from sklearn.metrics.pairwise import cosine_similarity
 import json
 from pymongo import MongoClient
 from bson.objectid import ObjectId
-import pandas as pd
+from snapshot import current_generation, file_sha256, generation_time, load_snapshot, save_snapshot
+from rate_limiter import TokenBucketLimiter
+from mcq_cache import MCQCache, mcq_cache_key
+from question_pool import QuestionPool
+from vector_index import build_index, index_type_of, needs_rebuild
+from pdf_extraction import extract_pdf_pages
+from embedding import load_embedder
+from query_cache import QueryCache
+from pagination import keyset_page, page_size
+from mongo_indexes import ensure_indexes
+from user_stats import backfill_user_stats, record_test_result, stats_response
+from dedup import normalized_text_hash, near_duplicate_rows, corpus_duplicate_rows, hash_distance
+import metrics
 
 dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(dotenv_path)
@@ -27,7 +38,7 @@ app = Flask(__name__)
 CORS(app)
 
 mongo_uri = os.getenv('MONGODB_URI')
-mongo_client = MongoClient(mongo_uri)
+mongo_client = MongoClient(mongo_uri, event_listeners=[metrics.MongoCommandMetrics()])
 db = mongo_client['jeeAce']
 tests_collection = db['tests']
 
@@ -35,24 +46,162 @@ pdf_folder = "./pdfs"
 output_dir = "./pdf_images"
 os.makedirs(output_dir, exist_ok=True)
 os.makedirs(pdf_folder, exist_ok=True)
+snapshot_dir = os.getenv('SNAPSHOT_DIR', './index_snapshot')
 
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_DIM = 384
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', 64))
+# torch, onnx or onnx-int8 (see embedding.py); the ONNX backends start faster
+# and never import torch.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_ONNX_FILE = os.getenv('EMBEDDING_ONNX_FILE') or None
+EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', 0))
+# Loaded on first use (or by the startup warm-up) so importing this module,
+# and the PDF extraction workers that re-import it, stay cheap.
+embedder = None
+embedder_lock = threading.Lock()
+
+# What /api/ready waits for; /api/health only says the process is up.
+readiness = {"corpus": False, "embedder": False}
 
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_API_URL = os.getenv('GROQ_API_URL', "https://api.groq.com/openai/v1/chat/completions")
 GROQ_MODEL = "llama3-8b-8192"
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv('GROQ_REQUESTS_PER_MINUTE', 30))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv('GROQ_TOKENS_PER_MINUTE', 30000))
+GROQ_MAX_TOKENS = 500
+MCQ_WORKERS = int(os.getenv('MCQ_WORKERS', 4))
+
+# Shared by every in-flight generation so concurrent requests stay inside the
+# provider's budget together.
+groq_rate_limiter = TokenBucketLimiter(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE)
+mcq_executor = ThreadPoolExecutor(max_workers=MCQ_WORKERS, thread_name_prefix='mcq')
+
+# Bump when the prompt in generate_enhanced_mcq changes so cached MCQs from
+# the old prompt are no longer served.
+PROMPT_VERSION = 1
+# 'regenerate' always calls the LLM, so the same passage gives a fresh MCQ
+# each time, and only falls back to the cache if that call fails. 'reuse'
+# serves the cached MCQ for a passage and saves the LLM call, at the cost of
+# repeated requests for a subject returning the same questions.
+MCQ_CACHE_MODE = os.getenv('MCQ_CACHE_MODE', 'regenerate')
+mcq_cache = MCQCache(
+    db_path=os.getenv('MCQ_CACHE_PATH', './mcq_cache.sqlite3') or None,
+    memory_entries=int(os.getenv('MCQ_CACHE_MEMORY_ENTRIES', 2048)),
+    max_entries=int(os.getenv('MCQ_CACHE_MAX_ENTRIES', 50000)),
+    ttl_seconds=int(os.getenv('MCQ_CACHE_TTL_SECONDS', 30 * 24 * 3600))
+)
+
+# Topic searches repeat a small set of topic names: their embeddings and
+# search results are cached (results until the question index changes).
+# QUERY_CACHE_WARM_TOPICS_FILE, one topic per line, is embedded at startup.
+query_cache = QueryCache(
+    embed_fn=lambda texts: embed_texts(texts),
+    embedding_entries=int(os.getenv('QUERY_CACHE_EMBEDDINGS', 1024)),
+    result_entries=int(os.getenv('QUERY_CACHE_RESULTS', 4096))
+)
+QUERY_CACHE_WARM_TOPICS_FILE = os.getenv('QUERY_CACHE_WARM_TOPICS_FILE')
+
+QUESTION_POOL_ENABLED = os.getenv('QUESTION_POOL_ENABLED', '1') == '1'
+QUESTION_POOL_LOW_WATERMARK = int(os.getenv('QUESTION_POOL_LOW_WATERMARK', 5))
+QUESTION_POOL_HIGH_WATERMARK = int(os.getenv('QUESTION_POOL_HIGH_WATERMARK', 15))
+# Slice of the provider budget the background refill may use; live requests
+# still go through groq_rate_limiter as well.
+QUESTION_POOL_REQUESTS_PER_MINUTE = int(os.getenv('QUESTION_POOL_REQUESTS_PER_MINUTE', 10))
 
-question_faiss_index = faiss.IndexFlatL2(384)
-image_faiss_index = faiss.IndexFlatL2(384)
+# One of flat, hnsw, ivf_flat, ivf_pq, sq8, fp16. Trained types stay flat
+# until an index holds FAISS_TRAIN_MIN_VECTORS vectors, and IVF indexes are
+# retrained from the raw vectors as the corpus grows.
+FAISS_INDEX_TYPE = os.getenv('FAISS_INDEX_TYPE', 'flat')
+FAISS_TRAIN_MIN_VECTORS = int(os.getenv('FAISS_TRAIN_MIN_VECTORS', 10000))
+FAISS_NPROBE = int(os.getenv('FAISS_NPROBE', 16))
+FAISS_EF_SEARCH = int(os.getenv('FAISS_EF_SEARCH', 64))
+
+# Raw embeddings, row-aligned with questions_data / images_data. Kept so the
+# FAISS indexes can be rebuilt (or retrained) without re-embedding anything.
+question_vectors = np.empty((0, EMBEDDING_DIM), dtype='float32')
+image_vectors = np.empty((0, EMBEDDING_DIM), dtype='float32')
+
+question_faiss_index = build_index(question_vectors, EMBEDDING_DIM, FAISS_INDEX_TYPE, FAISS_TRAIN_MIN_VECTORS)
+image_faiss_index = build_index(image_vectors, EMBEDDING_DIM, FAISS_INDEX_TYPE, FAISS_TRAIN_MIN_VECTORS)
 
 questions_data = [] 
 images_data = []
 question_image_associations = []  
 
+# Lookup indexes over the lists above, maintained alongside them:
+# question_id -> (image_id, similarity_score) of its best-scoring image,
+# and image_id -> image record.
+best_image_by_question = {}
+images_by_id = {}
+# content_hash -> image record, for the content-addressed image endpoint
+images_by_hash = {}
+
+# Per-subject question indexes so a subject-filtered search is a single
+# search over that subject's vectors. subject -> {"index", "rows"}, where
+# rows maps a partition position back to its questions_data row.
+question_subject_partitions = {}
+
+# Normalized-text hash -> question row for every question in the corpus, for
+# exact dedup.
+question_text_hashes = {}
+# Questions with at least this cosine similarity to an earlier one are
+# dropped as near-duplicates; the default 1.0 disables the embedding check,
+# so only normalized-text duplicates are dropped. Questions that differ only
+# in their numbers (the same problem with another mass or angle) often have
+# a similarity of 0.95 or more, so a lower threshold catches reworded copies
+# but also drops such variants.
+QUESTION_DEDUP_THRESHOLD = float(os.getenv('QUESTION_DEDUP_THRESHOLD', 1.0))
+dedup_stats = {"exact_in_document": 0, "near_in_document": 0, "exact_in_corpus": 0, "near_in_corpus": 0}
+# Images whose perceptual hashes differ in at most this many of 64 bits are
+# treated as the same picture (0 = identical bytes only).
+IMAGE_PHASH_MAX_DISTANCE = int(os.getenv('IMAGE_PHASH_MAX_DISTANCE', 0))
+image_dedup_stats = {"in_document": 0, "in_corpus": 0, "perceptual": 0}
+
+# filename -> {"sha256", "questions", "images"} for every PDF in the corpus
+processed_pdfs = {}
+# True while the indexes/vectors above are read-only memory maps of the snapshot
+corpus_is_mapped = False
+
+# Guards every structure above. Ingestion jobs extract in parallel but only
+# mutate the corpus while holding it; searches hold it while they map FAISS
+# positions back to questions_data rows.
+corpus_lock = threading.RLock()
+
+# 'standalone': this process ingests and serves (python server.py).
+# 'shared': one of several gunicorn workers (see gunicorn.conf.py) serving
+# the snapshot generation named by CURRENT from read-only memory maps and
+# switching when another process publishes a newer one.
+SERVING_MODE = os.getenv('SERVING_MODE', 'standalone')
+GENERATION_CHECK_INTERVAL = float(os.getenv('GENERATION_CHECK_INTERVAL', 2.0))
+# Snapshot generation the corpus above was loaded from or last saved as
+corpus_generation = None
+# Serializes ingestion across processes in shared mode
+ingest_lock_path = os.path.join(snapshot_dir, 'ingest.lock')
+# Ingest job records, so any worker can answer a status request
+ingest_jobs_dir = os.path.join(snapshot_dir, 'jobs')
+
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))
+# Processes used to extract page ranges of one PDF in parallel (1 = in-process)
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+PDF_EXTRACT_CHUNK_PAGES = int(os.getenv('PDF_EXTRACT_CHUNK_PAGES', 16))
+# Longest side of the WebP thumbnails written at ingestion (0 disables them)
+IMAGE_THUMBNAIL_SIZE = int(os.getenv('IMAGE_THUMBNAIL_SIZE', 320))
+IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600
+INGEST_JOB_HISTORY = int(os.getenv('INGEST_JOB_HISTORY', 200))
+ingest_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix='ingest')
+ingest_jobs = OrderedDict()
+ingest_jobs_lock = threading.Lock()
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy"}), 200
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    ready = all(readiness.values())
+    return jsonify({"ready": ready, **readiness}), 200 if ready else 503
+
 @app.route('/api/upload-pdf', methods=['POST'])
 def upload_pdf():
     if 'file' not in request.files:
@@ -64,18 +213,218 @@ def upload_pdf():
     
     pdf_path = os.path.join(pdf_folder, file.filename)
     file.save(pdf_path)
-    
-    extracted_questions, extracted_images, associations = extract_pdf_data_enhanced(pdf_path, output_dir)
-    
-    store_enhanced_data_to_faiss(extracted_questions, extracted_images, associations)
+
+    job = create_ingest_job(file.filename)
+    ingest_executor.submit(run_ingest_job, job["job_id"], pdf_path)
     
     return jsonify({
-        "message": "PDF processed successfully",
-        "questions_extracted": len(extracted_questions),
-        "images_extracted": len(extracted_images),
-        "associations_found": len(associations),
+        "message": "PDF queued for processing",
+        "job_id": job["job_id"],
+        "status_url": f"/api/ingest-jobs/{job['job_id']}",
         "pdf_name": file.filename
-    }), 200
+    }), 202
+
+@app.route('/api/ingest-jobs/<job_id>', methods=['GET'])
+def get_ingest_job(job_id):
+    with ingest_jobs_lock:
+        job = ingest_jobs.get(job_id)
+        if job is not None:
+            return jsonify(dict(job)), 200
+
+    job = load_ingest_job(job_id) if SERVING_MODE == 'shared' else None
+    if job is None:
+        return jsonify({"error": "Ingest job not found"}), 404
+    return jsonify(job), 200
+
+@app.route('/api/images/<content_hash>', methods=['GET'])
+def get_image(content_hash):
+    image = images_by_hash.get(content_hash)
+    if image is None:
+        return jsonify({"error": "Image not found"}), 404
+
+    variant = request.args.get('variant')
+    if variant:
+        image_path = image.get("variants", {}).get(variant)
+        mimetype = 'image/webp'
+        etag = f"{content_hash}-{variant}"
+    else:
+        image_path = image["image_path"]
+        mimetype = image.get("mime_type", "application/octet-stream")
+        etag = content_hash
+
+    if not image_path or not os.path.exists(image_path):
+        return jsonify({"error": "Image not found"}), 404
+
+    # send_file hands the open file to the WSGI server's file wrapper, which
+    # uses sendfile() where available; the content hash is a strong ETag and
+    # the bytes behind a URL never change. Stored paths are relative to the
+    # working directory, while send_file resolves relative paths against the
+    # app root.
+    with metrics.IMAGE_LOAD.time():
+        response = send_file(os.path.abspath(image_path), mimetype=mimetype, etag=etag, conditional=True, max_age=IMAGE_CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={IMAGE_CACHE_MAX_AGE}, immutable'
+    return response
+
+def image_url(image, variant=None):
+    url = f"/api/images/{image['content_hash']}"
+    return f"{url}?variant={variant}" if variant else url
+
+def create_ingest_job(pdf_name):
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "pdf_name": pdf_name,
+        "status": "queued",
+        "pages_total": None,
+        "pages_done": 0,
+        "questions_extracted": 0,
+        "images_extracted": 0,
+        "associations_found": 0,
+        "duplicates_dropped": None,
+        "errors": [],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "started_at": None,
+        "finished_at": None
+    }
+    with ingest_jobs_lock:
+        ingest_jobs[job["job_id"]] = job
+        while len(ingest_jobs) > INGEST_JOB_HISTORY:
+            ingest_jobs.popitem(last=False)
+        persist_ingest_job(job)
+    return job
+
+def update_ingest_job(job_id, **fields):
+    with ingest_jobs_lock:
+        job = ingest_jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+            persist_ingest_job(job)
+
+def persist_ingest_job(job):
+    # Shared mode only: the status request may reach a different worker.
+    if SERVING_MODE != 'shared':
+        return
+    try:
+        os.makedirs(ingest_jobs_dir, exist_ok=True)
+        path = os.path.join(ingest_jobs_dir, f"{job['job_id']}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+        if job["status"] == "queued":
+            names = sorted(os.listdir(ingest_jobs_dir), key=lambda n: os.path.getmtime(os.path.join(ingest_jobs_dir, n)))
+            for name in names[:-INGEST_JOB_HISTORY]:
+                os.remove(os.path.join(ingest_jobs_dir, name))
+    except Exception as e:
+        print(f"Error persisting ingest job {job['job_id']}: {e}")
+
+def load_ingest_job(job_id):
+    try:
+        uuid.UUID(job_id)
+        with open(os.path.join(ingest_jobs_dir, f"{job_id}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return None
+
+def run_ingest_job(job_id, pdf_path):
+    update_ingest_job(job_id, status="running", started_at=datetime.now(timezone.utc).isoformat())
+
+    def progress(pages_done, pages_total, questions_so_far, images_so_far):
+        update_ingest_job(
+            job_id, pages_done=pages_done, pages_total=pages_total,
+            questions_extracted=questions_so_far, images_extracted=images_so_far
+        )
+
+    try:
+        extracted_questions, extracted_images, associations, duplicates = ingest_pdf(pdf_path, progress, publish=True)
+
+        if QUESTION_POOL_ENABLED:
+            for subject in {q.get("subject") for q in extracted_questions if q.get("subject")}:
+                question_pool.register(subject)
+            question_pool.refresh()
+
+        update_ingest_job(
+            job_id, status="completed",
+            questions_extracted=len(extracted_questions),
+            images_extracted=len(extracted_images),
+            associations_found=len(associations),
+            duplicates_dropped=duplicates,
+            finished_at=datetime.now(timezone.utc).isoformat()
+        )
+    except Exception as e:
+        print(f"Error in ingest job {job_id} ({pdf_path}): {e}")
+        with ingest_jobs_lock:
+            job = ingest_jobs.get(job_id)
+            if job is not None:
+                job["errors"].append(str(e))
+                job["status"] = "failed"
+                job["finished_at"] = datetime.now(timezone.utc).isoformat()
+                persist_ingest_job(job)
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+def requested_stream_format():
+    stream = request.json.get('stream')
+    if stream in STREAM_MIMETYPES:
+        return stream
+    if stream is True:
+        return 'ndjson'
+    accept = request.headers.get('Accept', '')
+    for stream_format, mimetype in STREAM_MIMETYPES.items():
+        if mimetype in accept:
+            return stream_format
+    return None
+
+def iter_generated_questions(subject, count, topic_filter, inline_images=False):
+    pooled = question_pool.take(subject, topic_filter, count) if QUESTION_POOL_ENABLED else []
+    for question_data, mcq in pooled:
+        metrics.POOL_QUESTIONS.inc()
+        yield build_question_payload(question_data, mcq, inline_images)
+
+    shortfall = count - len(pooled)
+    if shortfall <= 0:
+        return
+
+    if topic_filter:
+        relevant_questions = retrieve_relevant_questions(topic_filter, subject, count * 3)
+    else:
+        relevant_questions = filter_questions_by_subject(subject, count * 3)
+
+    pooled_ids = {question_data["id"] for question_data, _ in pooled}
+    relevant_questions = [q for q in relevant_questions if q["id"] not in pooled_ids]
+
+    for question_data, mcq in generate_mcqs_concurrently(relevant_questions, shortfall):
+        metrics.LIVE_QUESTIONS.inc()
+        yield build_question_payload(question_data, mcq, inline_images)
+
+def generation_summary(subject, generated_count):
+    return {
+        "subject": subject,
+        "count": generated_count,
+        "total_questions_in_db": len(questions_data),
+        "total_images_in_db": len(images_data)
+    }
+
+def format_stream_record(stream_format, record_type, payload):
+    if stream_format == 'sse':
+        return f"event: {record_type}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"type": record_type, **payload}) + "\n"
+
+def stream_generated_questions(stream_format, subject, count, topic_filter, inline_images=False):
+    # Each question is written out as soon as it is validated and then
+    # dropped, so neither the client nor the server waits on the full set.
+    generated_count = 0
+    try:
+        for question_obj in iter_generated_questions(subject, count, topic_filter, inline_images):
+            generated_count += 1
+            yield format_stream_record(stream_format, "question", {"question": question_obj})
+    except Exception as e:
+        print(f"Error in generate_questions_api stream: {e}")
+        yield format_stream_record(stream_format, "error", {"error": str(e)})
+
+    yield format_stream_record(stream_format, "summary", generation_summary(subject, generated_count))
 
 @app.route('/api/generate-questions', methods=['POST'])
 def generate_questions_api():
@@ -84,74 +433,21 @@ def generate_questions_api():
         count = min(int(request.json.get('count', 10)), 25)
         topics = request.json.get('topics', [])
         topic_filter = topics[0] if topics else None
+        inline_images = bool(request.json.get('inline_images', False))
 
-        print(f"Generating {count} questions for subject: {subject}")
-        print(f"Total questions in database: {len(questions_data)}")
-
-        if topic_filter:
-            relevant_questions = retrieve_relevant_questions(topic_filter, subject, count * 3)
-        else:
-            relevant_questions = filter_questions_by_subject(subject, count * 3)
-
-        print(f"Found {len(relevant_questions)} relevant questions")
-
-        generated_questions = []
-        attempts = 0
-        max_attempts = len(relevant_questions)
-        
-        for question_data in relevant_questions:
-            if len(generated_questions) >= count:
-                break
-        
-            attempts += 1
-            if attempts > max_attempts:
-                break
-        
-        print(f"Processing question {attempts}/{max_attempts}")
-        
-        # Add delay between API calls to avoid rate limiting
-        if attempts > 1:  # Don't delay on first request
-            time.sleep(2)  # Wait 2 seconds between requests
-        
-        mcq = generate_enhanced_mcq(question_data)
-        
-        if mcq and mcq.get("question") and len(mcq.get("options", [])) == 4:
-            associated_image = find_associated_image(question_data['id'])
-            
-            question_obj = {
-                "question": mcq["question"],
-                "options": mcq["options"],
-                "answer": mcq["answer"],
-                "subject": question_data.get("subject", "Unknown"),
-                "source_text": question_data.get("text", "")[:200] + "...",
-                "page": question_data.get("page"),
-                "pdf_source": question_data.get("source_pdf")
-            }
-            
-            # Add image if available
-            if associated_image and os.path.exists(associated_image.get("image_path", "")):
-                try:
-                    with open(associated_image["image_path"], "rb") as img_file:
-                        img_data = base64.b64encode(img_file.read()).decode('utf-8')
-                        question_obj["image_data"] = f"data:image/jpeg;base64,{img_data}"
-                        question_obj["image_caption"] = associated_image.get("caption", "")
-                except Exception as e:
-                    print(f"Error loading image: {e}")
-            
-            generated_questions.append(question_obj)
-            print(f"Successfully generated question {len(generated_questions)}")
-        else:
-            print(f"Failed to generate valid MCQ for question: {question_data.get('text', '')[:50]}...")
-
+        stream_format = requested_stream_format()
+        if stream_format:
+            return Response(
+                stream_generated_questions(stream_format, subject, count, topic_filter, inline_images),
+                mimetype=STREAM_MIMETYPES[stream_format],
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
 
-        print(f"Final count: {len(generated_questions)} questions generated")
+        generated_questions = list(iter_generated_questions(subject, count, topic_filter, inline_images))
 
         return jsonify({
             "questions": generated_questions,
-            "subject": subject,
-            "count": len(generated_questions),
-            "total_questions_in_db": len(questions_data),
-            "total_images_in_db": len(images_data)
+            **generation_summary(subject, len(generated_questions))
         }), 200
         
     except Exception as e:
@@ -184,7 +480,6 @@ def save_test():
 def save_test_result():
     try:
         data = request.json
-        print(f"Received test result data: {data}")
         
       
         required_fields = ['userId', 'testId', 'results']
@@ -215,7 +510,11 @@ def save_test_result():
 
         result = db.test_results.insert_one(test_result)
         
-        print(f"Test result saved with ID: {result.inserted_id}")
+        try:
+            record_test_result(db, test_result)
+        except Exception as e:
+            # The result itself is stored; `python manage.py backfill-stats` repairs the rollup.
+            print(f"Error updating stats rollup for {test_result['userId']}: {e}")
         
         return jsonify({
             "message": "Test result saved successfully",
@@ -225,31 +524,62 @@ def save_test_result():
     except Exception as e:
         print(f"Error saving test result: {str(e)}")
         return jsonify({"error": f"Failed to save test result: {str(e)}"}), 500
+# Summary fields returned by the test history list mode; the questions array
+# (the bulk of each document) is fetched per test from /api/tests/<test_id>.
+TEST_SUMMARY_PROJECTION = {
+    "testType": 1, "subjects": 1, "totalQuestions": 1, "timeLimit": 1,
+    "createdAt": 1, "score": 1, "total": 1, "percentage": 1, "completedAt": 1
+}
+
+def serialize_test(test):
+    test_obj = {
+        "testId": str(test["_id"]),
+        "testType": test["testType"],
+        "subjects": test["subjects"],
+        "totalQuestions": test["totalQuestions"],
+        "timeLimit": test["timeLimit"],
+        "createdAt": test["createdAt"].isoformat(),
+        "score": test.get("score"),
+        "total": test.get("total"),
+        "percentage": test.get("percentage"),
+        "completedAt": test.get("completedAt", None).isoformat() if test.get("completedAt") else None,
+    }
+    if "questions" in test:
+        test_obj["questions"] = test["questions"]
+    return test_obj
+
 @app.route('/api/test-history', methods=['POST'])
 def get_test_history():
     user_id = request.json.get('userId')
     if not user_id:
         return jsonify({"error": "Missing userId"}), 400
 
+    if request.json.get('mode') == 'list':
+        try:
+            tests, next_cursor = keyset_page(
+                tests_collection, {"userId": user_id}, "createdAt",
+                cursor=request.json.get('cursor'),
+                limit=page_size(request.json.get('limit')),
+                projection=TEST_SUMMARY_PROJECTION
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"tests": [serialize_test(test) for test in tests], "next_cursor": next_cursor}), 200
+
     tests = tests_collection.find({"userId": user_id}).sort("createdAt", -1)
-    test_list = [
-        {
-            "testId": str(test["_id"]),
-            "testType": test["testType"],
-            "subjects": test["subjects"],
-            "totalQuestions": test["totalQuestions"],
-            "timeLimit": test["timeLimit"],
-            "questions": test["questions"], 
-            "createdAt": test["createdAt"].isoformat(),
-            "score": test.get("score"),
-            "total": test.get("total"),
-            "percentage": test.get("percentage"),
-            "completedAt": test.get("completedAt", None).isoformat() if test.get("completedAt") else None,
-        }
-        for test in tests
-    ]
+    test_list = [serialize_test(test) for test in tests]
     return jsonify({"tests": test_list}), 200
 
+@app.route('/api/tests/<test_id>', methods=['GET'])
+def get_test(test_id):
+    try:
+        test = tests_collection.find_one({"_id": ObjectId(test_id)})
+    except Exception:
+        return jsonify({"error": "Invalid test id"}), 400
+    if not test:
+        return jsonify({"error": "Test not found"}), 404
+    return jsonify(serialize_test(test)), 200
+
 @app.route('/api/subjects', methods=['GET'])
 def get_subjects():
     subjects = set()
@@ -261,200 +591,674 @@ def get_subjects():
         "subjects": list(subjects)
     }), 200
 
-def extract_pdf_data_enhanced(pdf_path, output_dir):
-    doc = fitz.open(pdf_path)
-    filename = os.path.basename(pdf_path)
-    
-    extracted_questions = []
-    extracted_images = []
+def extract_pdf_data_enhanced(pdf_path, output_dir, progress=None):
+    extracted_questions, extracted_images = extract_pdf_pages(
+        pdf_path, output_dir,
+        workers=PDF_EXTRACT_WORKERS,
+        chunk_pages=PDF_EXTRACT_CHUNK_PAGES,
+        progress=progress,
+        thumbnail_size=IMAGE_THUMBNAIL_SIZE,
+        page_timer=metrics.PDF_PAGE.observe
+    )
+
+    question_embeddings = embed_texts([q["text"] for q in extracted_questions])
+    caption_embeddings = embed_texts([img["caption"] for img in extracted_images])
+    associations = associate_questions_with_images(
+        extracted_questions, question_embeddings, extracted_images, caption_embeddings
+    )
+
+    return extracted_questions, extracted_images, associations, question_embeddings
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def associate_questions_with_images(questions, question_embeddings, images, caption_embeddings, threshold=0.3):
+    if not questions or not images:
+        return []
+
+    questions_by_page = {}
+    for row, question in enumerate(questions):
+        questions_by_page.setdefault(question["page"], []).append(row)
+    images_by_page = {}
+    for row, image in enumerate(images):
+        if image["caption"]:
+            images_by_page.setdefault(image["page"], []).append(row)
+
+    question_unit = normalize_rows(question_embeddings)
+    caption_unit = normalize_rows(caption_embeddings)
+
     associations = []
-    
-    current_subject = None
-    
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        text = page.get_text()
-        lower_text = text.lower()
-        
-        if "physics" in lower_text:
-            current_subject = "Physics"
-        elif "chemistry" in lower_text:
-            current_subject = "Chemistry"
-        elif "math" in lower_text or "mathematics" in lower_text:
-            current_subject = "Mathematics"
-        elif "biology" in lower_text:
-            current_subject = "Biology"
-        
-        text_blocks = page.get_text("dict")
-        
-        questions_on_page = extract_questions_from_text(text, page_num, filename, current_subject)
-        extracted_questions.extend(questions_on_page)
-        
-        for img_index, img in enumerate(page.get_images(full=True)):
-            xref = img[0]
-            base_image = doc.extract_image(xref)
-            image_bytes = base_image["image"]
-            image_ext = base_image["ext"]
-            
-            image_filename = f"{filename}_p{page_num+1}_img{img_index+1}.{image_ext}"
-            image_path = os.path.join(output_dir, image_filename)
-            
-            with open(image_path, "wb") as f:
-                f.write(image_bytes)
-            
-            img_rect = fitz.Rect(img[1:5]) 
-            
-            nearby_text = extract_text_near_image(page, img_rect, distance_threshold=100)
-            
-            image_data = {
-                "id": str(uuid.uuid4()),
-                "image_path": image_path,
-                "page": page_num + 1,
-                "source_pdf": filename,
-                "subject": current_subject,
-                "position": {
-                    "x": img_rect.x0,
-                    "y": img_rect.y0,
-                    "width": img_rect.width,
-                    "height": img_rect.height
-                },
-                "caption": nearby_text,
-                "surrounding_text": text  
-            }
-            
-            extracted_images.append(image_data)
-            
-            for question in questions_on_page:
-                similarity_score = calculate_text_similarity(question["text"], nearby_text)
-                if similarity_score > 0.3:
+    for page, image_rows in images_by_page.items():
+        question_rows = questions_by_page.get(page)
+        if not question_rows:
+            continue
+
+        # images x questions cosine similarities for the whole page in one matmul
+        similarities = caption_unit[image_rows] @ question_unit[question_rows].T
+        for i, image_row in enumerate(image_rows):
+            for j, question_row in enumerate(question_rows):
+                similarity_score = float(similarities[i, j])
+                if similarity_score > threshold:
                     associations.append({
-                        "question_id": question["id"],
-                        "image_id": image_data["id"],
+                        "question_id": questions[question_row]["id"],
+                        "image_id": images[image_row]["id"],
                         "similarity_score": similarity_score,
                         "association_type": "semantic"
                     })
-    
-    doc.close()
-    return extracted_questions, extracted_images, associations
 
-def extract_questions_from_text(text, page_num, filename, subject):
-    questions = []
-    
-    question_patterns = [
-        r'(\d+\.\s+.*?(?=\d+\.\s+|\n\n|\Z))', 
-        r'(Q\d+\.\s+.*?(?=Q\d+\.\s+|\n\n|\Z))',  
-        r'(\(\d+\)\s+.*?(?=\(\d+\)|\n\n|\Z))', 
-        r'(Example\s+\d+.*?(?=Example\s+\d+|\n\n|\Z))', 
-    ]
-    
-    for i, pattern in enumerate(question_patterns):
-        matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
-        for match in matches:
-            if len(match.strip()) > 50:  
-                question_data = {
-                    "id": str(uuid.uuid4()),
-                    "text": match.strip(),
-                    "page": page_num + 1,
-                    "source_pdf": filename,
-                    "subject": subject,
-                    "extraction_pattern": i,
-                    "word_count": len(match.split())
-                }
-                questions.append(question_data)
-    
-    return questions
+    return associations
 
-def extract_text_near_image(page, img_rect, distance_threshold=100):
-    words = page.get_text("words")
-    nearby_words = []
-    
-    for word in words:
-        word_rect = fitz.Rect(word[:4])
-        
-        distance = min(
-            abs(word_rect.x0 - img_rect.x1), 
-            abs(word_rect.x1 - img_rect.x0), 
-            abs(word_rect.y0 - img_rect.y1), 
-            abs(word_rect.y1 - img_rect.y0)  
-        )
-        
-        if distance <= distance_threshold:
-            nearby_words.append(word[4])  
-    
-    return " ".join(nearby_words)
+def get_embedder():
+    global embedder
+    if embedder is None:
+        with embedder_lock:
+            if embedder is None:
+                try:
+                    loaded = load_embedder(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_ONNX_FILE, EMBEDDING_THREADS)
+                except Exception as e:
+                    if EMBEDDING_BACKEND == 'torch':
+                        raise
+                    print(f"Could not load {EMBEDDING_BACKEND} embedder, falling back to torch: {e}")
+                    loaded = load_embedder(EMBEDDING_MODEL_NAME, 'torch')
+                embedder = loaded
+                readiness["embedder"] = True
+    return embedder
 
-def calculate_text_similarity(text1, text2):
-    if not text1 or not text2:
-        return 0.0
-    
-    try:
-        embeddings = embedder.encode([text1, text2])
-        similarity = cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
-        return float(similarity)
-    except:
-        return 0.0
+def embed_texts(texts, batch_size=None):
+    if not texts:
+        return np.empty((0, EMBEDDING_DIM), dtype='float32')
+    embedder = get_embedder()
+    with metrics.EMBED_BATCH.time():
+        return embedder.encode(texts, batch_size=batch_size or EMBED_BATCH_SIZE)
+
+def image_embedding_text(image):
+    return f"{image.get('caption', '')} {image.get('surrounding_text', '')[:500]}"
 
-def store_enhanced_data_to_faiss(questions, images, associations):
+def store_enhanced_data_to_faiss(questions, images, associations, question_embeddings=None):
     global questions_data, images_data, question_image_associations
+    global question_vectors, image_vectors
    
+    ensure_writable_corpus()
+
     if questions:
-        question_embeddings = []
-        for question in questions:
-            embedding = embedder.encode(question["text"])
-            question_embeddings.append(embedding)
-            questions_data.append(question)
-        
-        if question_embeddings:
-            embeddings_np = np.array(question_embeddings, dtype='float32')
+        if question_embeddings is None:
+            embeddings_np = embed_texts([question["text"] for question in questions])
+        else:
+            embeddings_np = np.ascontiguousarray(question_embeddings, dtype='float32')
+        with metrics.INDEX_ADD.time():
             question_faiss_index.add(embeddings_np)
+        question_vectors = np.vstack([question_vectors, embeddings_np])
+        add_to_subject_partitions(len(questions_data), questions, embeddings_np)
+        questions_data.extend(questions)
+        question_text_hashes.update((normalized_text_hash(question["text"]), question) for question in questions)
+        query_cache.invalidate_results()
     
     if images:
-        image_embeddings = []
-        for image in images:
-            text_to_embed = f"{image.get('caption', '')} {image.get('surrounding_text', '')[:500]}"
-            embedding = embedder.encode(text_to_embed)
-            image_embeddings.append(embedding)
-            images_data.append(image)
-        
-        if image_embeddings:
-            embeddings_np = np.array(image_embeddings, dtype='float32')
+        embeddings_np = embed_texts([image_embedding_text(image) for image in images])
+        with metrics.INDEX_ADD.time():
             image_faiss_index.add(embeddings_np)
+        image_vectors = np.vstack([image_vectors, embeddings_np])
+        images_data.extend(images)
+        index_images(images)
     
     question_image_associations.extend(associations)
+    index_associations(associations)
+    retrain_indexes_if_needed()
+
+def index_images(images):
+    for image in images:
+        images_by_id[image["id"]] = image
+        if image.get("content_hash"):
+            images_by_hash[image["content_hash"]] = image
+
+def index_associations(associations):
+    for association in associations:
+        current = best_image_by_question.get(association["question_id"])
+        if current is None or association["similarity_score"] > current[1]:
+            best_image_by_question[association["question_id"]] = (association["image_id"], association["similarity_score"])
+
+def rebuild_lookup_indexes():
+    images_by_id.clear()
+    images_by_hash.clear()
+    best_image_by_question.clear()
+    index_images(images_data)
+    index_associations(question_image_associations)
+
+def add_to_subject_partitions(start_row, questions, embeddings):
+    offsets_by_subject = {}
+    for offset, question in enumerate(questions):
+        offsets_by_subject.setdefault(question.get("subject"), []).append(offset)
+
+    for subject, offsets in offsets_by_subject.items():
+        partition = question_subject_partitions.get(subject)
+        if partition is None:
+            partition = {"index": build_faiss_index(np.empty((0, EMBEDDING_DIM), dtype='float32')), "rows": []}
+            question_subject_partitions[subject] = partition
+        partition["index"].add(np.ascontiguousarray(embeddings[offsets], dtype='float32'))
+        partition["rows"].extend(start_row + offset for offset in offsets)
+
+def rebuild_subject_partitions():
+    question_subject_partitions.clear()
+    if questions_data:
+        add_to_subject_partitions(0, questions_data, question_vectors)
+
+def rebuild_derived_indexes():
+    query_cache.invalidate_results()
+    rebuild_lookup_indexes()
+    rebuild_subject_partitions()
+    question_text_hashes.clear()
+    question_text_hashes.update((normalized_text_hash(question["text"]), question) for question in questions_data)
+
+def build_faiss_index(vectors):
+    return build_index(
+        vectors, EMBEDDING_DIM, FAISS_INDEX_TYPE, FAISS_TRAIN_MIN_VECTORS,
+        nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH
+    )
+
+def retrain_indexes_if_needed():
+    # Returns True when a persisted (question/image) index was rebuilt.
+    global question_faiss_index, image_faiss_index
+    rebuilt = False
+
+    if needs_rebuild(question_faiss_index, FAISS_INDEX_TYPE, len(questions_data), FAISS_TRAIN_MIN_VECTORS):
+        question_faiss_index = build_faiss_index(question_vectors)
+        print(f"Rebuilt question index as {index_type_of(question_faiss_index)} over {len(questions_data)} vectors")
+        rebuilt = True
+    if needs_rebuild(image_faiss_index, FAISS_INDEX_TYPE, len(images_data), FAISS_TRAIN_MIN_VECTORS):
+        image_faiss_index = build_faiss_index(image_vectors)
+        print(f"Rebuilt image index as {index_type_of(image_faiss_index)} over {len(images_data)} vectors")
+        rebuilt = True
+
+    for partition in question_subject_partitions.values():
+        if needs_rebuild(partition["index"], FAISS_INDEX_TYPE, len(partition["rows"]), FAISS_TRAIN_MIN_VECTORS):
+            partition["index"] = build_faiss_index(question_vectors[partition["rows"]])
+            query_cache.invalidate_results()
+
+    if rebuilt:
+        query_cache.invalidate_results()
+    return rebuilt
+
+def ensure_writable_corpus():
+    # Memory-mapped snapshot files are read-only; copy them into memory
+    # before the first mutation.
+    global question_faiss_index, image_faiss_index, question_vectors, image_vectors, corpus_is_mapped
+    if not corpus_is_mapped:
+        return
+    question_vectors = np.array(question_vectors, dtype='float32')
+    image_vectors = np.array(image_vectors, dtype='float32')
+    question_faiss_index = build_faiss_index(question_vectors)
+    image_faiss_index = build_faiss_index(image_vectors)
+    corpus_is_mapped = False
+    rebuild_subject_partitions()
+    query_cache.invalidate_results()
+
+def remove_pdf_from_corpus(filename):
+    global question_faiss_index, image_faiss_index, question_vectors, image_vectors, corpus_is_mapped
+
+    question_rows = release_references(questions_data, {filename})
+    image_rows = release_references(images_data, {filename})
+    kept_questions = [questions_data[i] for i in question_rows]
+    kept_images = [images_data[i] for i in image_rows]
+    kept_question_ids = {q["id"] for q in kept_questions}
+    kept_image_ids = {img["id"] for img in kept_images}
+    kept_associations = [
+        a for a in question_image_associations
+        if a["question_id"] in kept_question_ids and a["image_id"] in kept_image_ids
+    ]
+
+    questions_data[:] = kept_questions
+    images_data[:] = kept_images
+    question_image_associations[:] = kept_associations
+    question_vectors = np.array(question_vectors[question_rows], dtype='float32').reshape(-1, EMBEDDING_DIM)
+    image_vectors = np.array(image_vectors[image_rows], dtype='float32').reshape(-1, EMBEDDING_DIM)
+    question_faiss_index = build_faiss_index(question_vectors)
+    image_faiss_index = build_faiss_index(image_vectors)
+    corpus_is_mapped = False
+    processed_pdfs.pop(filename, None)
+    rebuild_derived_indexes()
+
+def ingest_pdf(pdf_path, progress=None, publish=False):
+    # With publish, the updated corpus is saved as a new snapshot generation
+    # before the write lock is released.
+    filename = os.path.basename(pdf_path)
+    pdf_hash = file_sha256(pdf_path)
+
+    # Extraction and embedding run without the lock so several jobs can
+    # work at once; only the corpus mutation below is serialized.
+    extracted_questions, extracted_images, associations, question_embeddings = extract_pdf_data_enhanced(pdf_path, output_dir, progress)
+
+    with corpus_write_lock():
+        previous = processed_pdfs.get(filename)
+        if previous and previous["sha256"] != pdf_hash:
+            # The file was replaced; its old rows would otherwise survive restarts.
+            remove_pdf_from_corpus(filename)
+            previous = None
+
+        extracted_questions, question_embeddings, associations, duplicates = drop_duplicate_questions(
+            extracted_questions, question_embeddings, associations
+        )
+        extracted_images, associations, image_duplicates = drop_duplicate_images(extracted_images, associations)
+        store_enhanced_data_to_faiss(extracted_questions, extracted_images, associations, question_embeddings)
+
+        processed_pdfs[filename] = {
+            "sha256": pdf_hash,
+            "questions": (previous or {}).get("questions", 0) + len(extracted_questions),
+            "images": (previous or {}).get("images", 0) + len(extracted_images),
+        }
+        if publish:
+            publish_corpus()
+    return extracted_questions, extracted_images, associations, {"questions": duplicates, "images": image_duplicates}
+
+def drop_duplicate_questions(questions, embeddings, associations):
+    # Callers hold corpus_lock: questions are checked against the live corpus.
+    counts = {"exact_in_document": 0, "near_in_document": 0, "exact_in_corpus": 0, "near_in_corpus": 0}
+
+    # A question dropped as a duplicate of one already in the corpus adds a
+    # reference from its PDF to that question, so the question stays while
+    # either PDF is in the corpus.
+    keep = []
+    seen_hashes = set()
+    for row, question in enumerate(questions):
+        text_hash = normalized_text_hash(question["text"])
+        if text_hash in question_text_hashes:
+            counts["exact_in_corpus"] += 1
+            add_reference(question_text_hashes[text_hash], question["source_pdf"])
+        elif text_hash in seen_hashes:
+            counts["exact_in_document"] += 1
+        else:
+            seen_hashes.add(text_hash)
+            keep.append(row)
+
+    if QUESTION_DEDUP_THRESHOLD < 1.0 and keep:
+        near_rows = near_duplicate_rows(embeddings[keep], QUESTION_DEDUP_THRESHOLD)
+        counts["near_in_document"] = len(near_rows)
+        keep = [row for i, row in enumerate(keep) if i not in near_rows]
+
+        near_rows = corpus_duplicate_rows(embeddings[keep], question_faiss_index, QUESTION_DEDUP_THRESHOLD)
+        counts["near_in_corpus"] = len(near_rows)
+        for i, corpus_row in near_rows.items():
+            add_reference(questions_data[corpus_row], questions[keep[i]]["source_pdf"])
+        keep = [row for i, row in enumerate(keep) if i not in near_rows]
+
+    for key, value in counts.items():
+        dedup_stats[key] += value
+
+    kept_questions = [questions[row] for row in keep]
+    for question in kept_questions:
+        question["references"] = {}
+        add_reference(question, question["source_pdf"])
+    kept_ids = {question["id"] for question in kept_questions}
+    kept_associations = [a for a in associations if a["question_id"] in kept_ids]
+    return kept_questions, embeddings[keep].reshape(-1, EMBEDDING_DIM), kept_associations, counts
+
+def find_similar_image(phash, candidates):
+    for image in candidates:
+        other = image.get("perceptual_hash")
+        if other and hash_distance(phash, other) <= IMAGE_PHASH_MAX_DISTANCE:
+            return image
+    return None
+
+def drop_duplicate_images(images, associations):
+    # Callers hold corpus_lock. Each distinct image keeps one record (and one
+    # embedding); later occurrences only add a reference to it, and their
+    # associations are pointed at the kept record.
+    counts = {"in_document": 0, "in_corpus": 0, "perceptual": 0}
+    kept = []
+    kept_by_hash = {}
+    canonical_ids = {}
+
+    for image in images:
+        canonical = kept_by_hash.get(image["content_hash"])
+        kind = "in_document"
+        if canonical is None:
+            canonical = images_by_hash.get(image["content_hash"])
+            kind = "in_corpus"
+        if canonical is None and IMAGE_PHASH_MAX_DISTANCE > 0 and image.get("perceptual_hash"):
+            canonical = (find_similar_image(image["perceptual_hash"], kept) or
+                         find_similar_image(image["perceptual_hash"], images_by_hash.values()))
+            kind = "perceptual"
+
+        if canonical is None:
+            image["references"] = {}
+            add_reference(image, image["source_pdf"])
+            kept_by_hash[image["content_hash"]] = image
+            kept.append(image)
+        else:
+            counts[kind] += 1
+            add_reference(canonical, image["source_pdf"])
+            canonical_ids[image["id"]] = canonical["id"]
+
+    for key, value in counts.items():
+        image_dedup_stats[key] += value
+
+    remapped = {}
+    for association in associations:
+        image_id = canonical_ids.get(association["image_id"], association["image_id"])
+        key = (association["question_id"], image_id)
+        if key not in remapped or association["similarity_score"] > remapped[key]["similarity_score"]:
+            remapped[key] = {**association, "image_id": image_id}
+
+    return kept, list(remapped.values()), counts
+
+def add_reference(record, source_pdf):
+    # Rows shared by several PDFs record how many times each PDF contributed
+    # them.
+    references = record.setdefault("references", {})
+    references[source_pdf] = references.get(source_pdf, 0) + 1
+    record["ref_count"] = sum(references.values())
+
+def release_references(records, removed_pdfs):
+    # Drops the references held by removed_pdfs and returns the rows of the
+    # records that are still referenced by some other PDF.
+    rows = []
+    for row, record in enumerate(records):
+        references = record.get("references") or {record.get("source_pdf"): 1}
+        remaining = {pdf: n for pdf, n in references.items() if pdf not in removed_pdfs}
+        if not remaining:
+            continue
+        if len(remaining) != len(references):
+            record["references"] = remaining
+            record["ref_count"] = sum(remaining.values())
+            if record.get("source_pdf") not in remaining:
+                record["source_pdf"] = next(iter(remaining))
+        rows.append(row)
+    return rows
+
+# Only files extraction writes are swept: <sha256>.<ext> images and their
+# <sha256>_thumb.webp thumbnails. Anything else in output_dir is left alone.
+IMAGE_FILE_PATTERN = re.compile(r'^[0-9a-f]{64}\.\w+$')
+THUMBNAIL_FILE_PATTERN = re.compile(r'^[0-9a-f]{64}_thumb\.webp$')
+
+def remove_unreferenced_image_files(published_before):
+    # Image files are shared by content hash, so they are only deleted once
+    # no record points at them. Another process may have written (or reused,
+    # which refreshes the mtime) a file for an upload it has not published
+    # yet, so only files older than published_before are candidates.
+    referenced = set()
+    for image in images_data:
+        referenced.add(os.path.abspath(image["image_path"]))
+        referenced.update(os.path.abspath(path) for path in image.get("variants", {}).values())
+
+    removed = 0
+    for directory, pattern in ((output_dir, IMAGE_FILE_PATTERN),
+                               (os.path.join(output_dir, "variants"), THUMBNAIL_FILE_PATTERN)):
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.abspath(os.path.join(directory, name))
+            if not pattern.match(name) or path in referenced or not os.path.isfile(path):
+                continue
+            if os.path.getmtime(path) < published_before:
+                os.remove(path)
+                removed += 1
+    if removed:
+        print(f"Removed {removed} unreferenced image files")
+
+def save_corpus_snapshot():
+    global corpus_generation
+    try:
+        corpus_generation = save_snapshot(
+            snapshot_dir, EMBEDDING_MODEL_NAME, processed_pdfs,
+            questions_data, images_data, question_image_associations,
+            question_faiss_index, image_faiss_index, question_vectors, image_vectors,
+            partitions=question_subject_partitions
+        )
+    except Exception as e:
+        print(f"Error saving corpus snapshot: {e}")
+
+def publish_corpus():
+    # Callers hold corpus_write_lock.
+    save_corpus_snapshot()
+    if SERVING_MODE == 'shared':
+        # Swap this worker's private copy for the published memory maps,
+        # which the other workers share.
+        snapshot = load_snapshot(snapshot_dir, EMBEDDING_MODEL_NAME)
+        if snapshot is not None:
+            install_snapshot(snapshot)
+
+@contextmanager
+def ingest_file_lock():
+    import fcntl
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(ingest_lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+@contextmanager
+def corpus_write_lock():
+    # In shared mode other workers publish too: hold the cross-process lock
+    # and start from the newest generation so their additions are kept.
+    if SERVING_MODE != 'shared':
+        with corpus_lock:
+            yield
+        return
+    with ingest_file_lock():
+        refresh_corpus_generation()
+        with corpus_lock:
+            yield
+
+def install_snapshot(snapshot, text_hashes=None):
+    # Serve a snapshot exactly as stored, from its memory maps. Callers hold
+    # corpus_lock.
+    global question_faiss_index, image_faiss_index, question_vectors, image_vectors
+    global corpus_is_mapped, corpus_generation
+    questions_data[:] = snapshot["questions"]
+    images_data[:] = snapshot["images"]
+    question_image_associations[:] = snapshot["associations"]
+    question_vectors = snapshot["question_vectors"]
+    image_vectors = snapshot["image_vectors"]
+    question_faiss_index = snapshot["question_index"]
+    image_faiss_index = snapshot["image_index"]
+    corpus_is_mapped = True
+    corpus_generation = snapshot["generation"]
+    processed_pdfs.clear()
+    processed_pdfs.update(snapshot["pdfs"])
+
+    query_cache.invalidate_results()
+    rebuild_lookup_indexes()
+    question_subject_partitions.clear()
+    question_subject_partitions.update(snapshot["partitions"])
+    if text_hashes is None:
+        text_hashes = {normalized_text_hash(question["text"]): question for question in questions_data}
+    question_text_hashes.clear()
+    question_text_hashes.update(text_hashes)
+
+def refresh_corpus_generation():
+    # Switch to the generation CURRENT names if it is not the one in use.
+    # The snapshot is loaded outside corpus_lock; only the swap holds it.
+    generation = current_generation(snapshot_dir)
+    if generation is None or generation == corpus_generation:
+        return False
+    snapshot = load_snapshot(snapshot_dir, EMBEDDING_MODEL_NAME)
+    if snapshot is None:
+        return False
+    text_hashes = {normalized_text_hash(question["text"]): question for question in snapshot["questions"]}
+    with corpus_lock:
+        # An upload in this worker may have published and installed a newer
+        # generation while this one was loading. Names sort by creation time.
+        if corpus_generation is not None and snapshot["generation"] <= corpus_generation:
+            return False
+        install_snapshot(snapshot, text_hashes)
+    print(f"Serving snapshot generation {snapshot['generation']}: {len(snapshot['questions'])} questions")
+
+    if QUESTION_POOL_ENABLED and readiness["corpus"]:
+        for subject in {q.get("subject") for q in snapshot["questions"] if q.get("subject")}:
+            question_pool.register(subject)
+        question_pool.refresh()
+    return True
+
+def watch_corpus_generation():
+    while True:
+        time.sleep(GENERATION_CHECK_INTERVAL)
+        try:
+            refresh_corpus_generation()
+        except Exception as e:
+            print(f"Error switching snapshot generation: {e}")
 
 def retrieve_relevant_questions(query, subject, k=10):
     if not questions_data:
         return []
-    
-    query_embedding = embedder.encode([query])
-    
-    distances, indices = question_faiss_index.search(query_embedding.astype('float32'), min(k*2, len(questions_data)))
-    
-    relevant_questions = []
-    for idx in indices[0]:
-        if idx < len(questions_data):
-            question = questions_data[idx]
-            if subject == 'All' or question.get('subject') == subject:
-                relevant_questions.append(question)
-    
-    return relevant_questions[:k]
+
+    with corpus_lock:
+        cached = query_cache.get_results(query, subject, k)
+    if cached is not None:
+        return list(cached)
+
+    query_embedding = query_cache.embedding(query)
+
+    with corpus_lock:
+        if subject == 'All':
+            index, rows = question_faiss_index, None
+        else:
+            partition = question_subject_partitions.get(subject)
+            if partition is None:
+                return []
+            index, rows = partition["index"], partition["rows"]
+
+        requested_k = k
+        k = min(k, index.ntotal)
+        if k <= 0:
+            return []
+        
+        with metrics.INDEX_SEARCH.time():
+            distances, indices = index.search(query_embedding, k)
+        
+        results = [
+            questions_data[rows[idx] if rows is not None else idx]
+            for idx in indices[0] if idx >= 0
+        ]
+        query_cache.put_results(query, subject, requested_k, results)
+        return list(results)
 
 def filter_questions_by_subject(subject, k=10):
-    filtered_questions = []
-    for question in questions_data:
-        if subject == 'All' or question.get('subject') == subject:
-            filtered_questions.append(question)
-    
-    return filtered_questions[:k]
+    with corpus_lock:
+        if subject == 'All':
+            return questions_data[:k]
+        partition = question_subject_partitions.get(subject)
+        if partition is None:
+            return []
+        return [questions_data[row] for row in partition["rows"][:k]]
+
+def sample_pool_candidates(subject, topic, n, exclude_ids):
+    if topic:
+        candidates = retrieve_relevant_questions(topic, subject, n * 3)
+    else:
+        candidates = filter_questions_by_subject(subject, len(questions_data))
+
+    candidates = [
+        q for q in candidates
+        if q["id"] not in exclude_ids and len(q.get("text", "").strip()) >= 30
+    ]
+    # Extra candidates leave room for passages the LLM fails on.
+    return random.sample(candidates, min(len(candidates), n * 2))
 
 def find_associated_image(question_id):
-    for association in question_image_associations:
-        if association["question_id"] == question_id:
-            image_id = association["image_id"]
-            for image in images_data:
-                if image["id"] == image_id:
-                    return image
-    return None
+    best = best_image_by_question.get(question_id)
+    if best is None:
+        return None
+    return images_by_id.get(best[0])
+
+def build_question_payload(question_data, mcq, inline_images=False):
+    question_obj = {
+        "question": mcq["question"],
+        "options": mcq["options"],
+        "answer": mcq["answer"],
+        "subject": question_data.get("subject", "Unknown"),
+        "source_text": question_data.get("text", "")[:200] + "...",
+        "page": question_data.get("page"),
+        "pdf_source": question_data.get("source_pdf")
+    }
+
+    associated_image = find_associated_image(question_data['id'])
+    if associated_image:
+        question_obj["image_url"] = image_url(associated_image)
+        if "thumb" in associated_image.get("variants", {}):
+            question_obj["thumbnail_url"] = image_url(associated_image, "thumb")
+        question_obj["image_caption"] = associated_image.get("caption", "")
+
+        # Legacy clients can still ask for the bytes inline.
+        if inline_images and os.path.exists(associated_image.get("image_path", "")):
+            try:
+                with metrics.IMAGE_LOAD.time(), open(associated_image["image_path"], "rb") as img_file:
+                    img_data = base64.b64encode(img_file.read()).decode('utf-8')
+                    question_obj["image_data"] = f"data:{associated_image.get('mime_type', 'image/jpeg')};base64,{img_data}"
+            except Exception as e:
+                print(f"Error loading image: {e}")
+
+    return question_obj
+
+def is_valid_mcq(mcq):
+    return bool(mcq and mcq.get("question") and len(mcq.get("options", [])) == 4)
+
+def generate_mcqs_concurrently(candidates, count):
+    # Yields (question_data, mcq) as valid MCQs complete. At most MCQ_WORKERS
+    # calls (and never more than are still needed) are in flight per request,
+    # and nothing new is submitted once `count` MCQs have been produced.
+    candidates = iter(candidates)
+    in_flight = {}
+    produced = 0
+
+    def submit_next():
+        question_data = next(candidates, None)
+        if question_data is None:
+            return False
+        in_flight[mcq_executor.submit(generate_cached_mcq, question_data)] = question_data
+        return True
+
+    try:
+        while len(in_flight) < min(MCQ_WORKERS, count) and submit_next():
+            pass
+
+        while in_flight and produced < count:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                question_data = in_flight.pop(future)
+                try:
+                    mcq = future.result()
+                except Exception as e:
+                    print(f"Error generating MCQ: {e}")
+                    mcq = None
+
+                if is_valid_mcq(mcq) and produced < count:
+                    produced += 1
+                    yield question_data, mcq
+
+            while len(in_flight) < min(MCQ_WORKERS, count - produced) and submit_next():
+                pass
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+def generate_cached_mcq(question_data):
+    key = mcq_cache_key(question_data.get("text", ""), question_data.get("subject", ""), GROQ_MODEL, PROMPT_VERSION)
+
+    if MCQ_CACHE_MODE == 'regenerate':
+        mcq_cache.record_bypass()
+    else:
+        cached = mcq_cache.get(key)
+        if cached:
+            return cached
+
+    mcq = generate_enhanced_mcq(question_data)
+    if is_valid_mcq(mcq):
+        mcq_cache.put(key, mcq)
+        return mcq
+
+    if MCQ_CACHE_MODE == 'regenerate':
+        return mcq_cache.get(key)
+    return mcq
+
+def parse_retry_after(response, default):
+    try:
+        return max(float(response.headers.get('Retry-After')), 0.0)
+    except (TypeError, ValueError):
+        return default
 
 def generate_enhanced_mcq(question_data):
     text = question_data.get("text", "")
@@ -487,9 +1291,15 @@ D. [Option D]
 Answer: [A/B/C/D]
 """
     
+    # Rough prompt size (~4 characters per token) plus the completion budget.
+    estimated_tokens = len(prompt) // 4 + GROQ_MAX_TOKENS
+
     max_retries = 3
     for attempt in range(max_retries):
         try:
+            with metrics.LLM_RATE_LIMIT_WAIT.time():
+                groq_rate_limiter.acquire(estimated_tokens)
+            request_start = time.perf_counter()
             response = requests.post(
                 GROQ_API_URL,
                 headers={
@@ -500,16 +1310,22 @@ Answer: [A/B/C/D]
                     'model': GROQ_MODEL,
                     'messages': [{'role': 'user', 'content': prompt}],
                     'temperature': 0.7,
-                    'max_tokens': 500
+                    'max_tokens': GROQ_MAX_TOKENS
                 },
                 timeout=30
             )
-            
+            metrics.LLM_REQUEST.observe(time.perf_counter() - request_start)
+            metrics.LLM_REQUESTS.labels(str(response.status_code)).inc()
+
             if response.status_code == 200:
                 response_data = response.json()
+                used_tokens = response_data.get("usage", {}).get("total_tokens")
+                if used_tokens:
+                    groq_rate_limiter.adjust(used_tokens - estimated_tokens)
                 if "choices" in response_data and response_data["choices"]:
                     mcq_text = response_data["choices"][0]["message"]["content"].strip()
-                    parsed_mcq = parse_mcq_string(mcq_text)
+                    with metrics.MCQ_PARSE.time():
+                        parsed_mcq = parse_mcq_string(mcq_text)
                     
                     # Validate the parsed MCQ
                     if (parsed_mcq and 
@@ -518,12 +1334,15 @@ Answer: [A/B/C/D]
                         parsed_mcq.get("answer") in ["A", "B", "C", "D"]):
                         return parsed_mcq
                     else:
-                        print(f"Invalid MCQ format for question: {text[:50]}...")
+                        metrics.MCQ_PARSE_FAILURES.inc()
                         return None
             elif response.status_code == 429:
-                print(f"Rate limit hit, attempt {attempt + 1}/{max_retries}")
+                metrics.LLM_RATE_LIMITED.inc()
+                # Pause the shared limiter so every worker backs off together;
+                # the next acquire() waits out the penalty.
+                groq_rate_limiter.penalize(parse_retry_after(response, 5 * (attempt + 1)))
                 if attempt < max_retries - 1:
-                    time.sleep(5 * (attempt + 1))  # Exponential backoff: 5s, 10s, 15s
+                    metrics.LLM_RETRIES.inc()
                     continue
                 else:
                     print(f"Max retries reached for rate limiting")
@@ -535,7 +1354,7 @@ Answer: [A/B/C/D]
         except Exception as e:
             print(f"Error generating MCQ (attempt {attempt + 1}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(2)
+                metrics.LLM_RETRIES.inc()
                 continue
             else:
                 return None
@@ -582,15 +1401,26 @@ def parse_mcq_string(mcq_str):
 @app.route('/api/user-test-results/<user_id>', methods=['GET'])
 def get_user_test_results(user_id):
     try:
-       
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 10))
-        skip = (page - 1) * limit
-     
-        results = list(db.test_results.find(
-            {"userId": user_id}
-        ).sort("completedAt", -1).skip(skip).limit(limit))
-        
+        # Page-numbered by default; ?cursor= or ?mode=cursor opts into keyset
+        # paging, which does not slow down with depth.
+        cursor = request.args.get('cursor')
+        if cursor or request.args.get('mode') == 'cursor':
+            limit = page_size(request.args.get('limit'), default=10)
+            try:
+                results, next_cursor = keyset_page(
+                    db.test_results, {"userId": user_id}, "completedAt", cursor=cursor, limit=limit
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            page = None
+        else:
+            page = int(request.args.get('page', 1))
+            limit = int(request.args.get('limit', 10))
+            skip = (page - 1) * limit
+            results = list(db.test_results.find(
+                {"userId": user_id}
+            ).sort([("completedAt", -1), ("_id", -1)]).skip(skip).limit(limit))
+
         for result in results:
             result['_id'] = str(result['_id'])
        
@@ -605,15 +1435,24 @@ def get_user_test_results(user_id):
        
         total_count = db.test_results.count_documents({"userId": user_id})
         
-        return jsonify({
-            "results": results,
-            "pagination": {
+        if page is not None:
+            pagination = {
                 "current_page": page,
                 "total_pages": (total_count + limit - 1) // limit,
                 "total_results": total_count,
                 "has_next": skip + limit < total_count,
                 "has_prev": page > 1
             }
+        else:
+            pagination = {
+                "total_results": total_count,
+                "has_next": next_cursor is not None,
+                "next_cursor": next_cursor
+            }
+
+        return jsonify({
+            "results": results,
+            "pagination": pagination
         }), 200
         
     except Exception as e:
@@ -622,66 +1461,12 @@ def get_user_test_results(user_id):
 @app.route('/api/user-stats/<user_id>', methods=['GET'])
 def get_user_stats(user_id):
     try:
-      
-        pipeline = [
-            {"$match": {"userId": user_id}},
-            {"$group": {
-                "_id": "$userId",
-                "totalTests": {"$sum": 1},
-                "averageScore": {"$avg": "$results.percentage"},
-                "totalQuestions": {"$sum": "$totalQuestions"},
-                "totalTimeTaken": {"$sum": "$timeTaken"},
-                "bestScore": {"$max": "$results.percentage"},
-                "recentTests": {"$push": {
-                    "testName": "$testName",
-                    "score": "$results.percentage",
-                    "completedAt": "$completedAt",
-                    "subjects": "$subjects"
-                }}
-            }}
-        ]
-        
-        stats = list(db.test_results.aggregate(pipeline))
-        
-        if not stats:
-            return jsonify({
-                "totalTests": 0,
-                "averageScore": 0,
-                "totalQuestions": 0,
-                "totalTimeTaken": 0,
-                "bestScore": 0,
-                "recentTests": [],
-                "subjectPerformance": []
-            }), 200
-        
-        user_stats = stats[0]
-        
-    
-        user_stats["averageScore"] = user_stats.get("averageScore") or 0
-        user_stats["bestScore"] = user_stats.get("bestScore") or 0
-        user_stats["totalTimeTaken"] = user_stats.get("totalTimeTaken") or 0
-        
-        subject_pipeline = [
-            {"$match": {"userId": user_id}},
-            {"$unwind": "$subjects"},
-            {"$group": {
-                "_id": "$subjects",
-                "averageScore": {"$avg": "$results.percentage"},
-                "testCount": {"$sum": 1}
-            }}
-        ]
-        
-        subject_stats = list(db.test_results.aggregate(subject_pipeline))
-        
-        return jsonify({
-            "totalTests": user_stats.get("totalTests", 0),
-            "averageScore": round(user_stats.get("averageScore", 0), 2),
-            "totalQuestions": user_stats.get("totalQuestions", 0),
-            "totalTimeTaken": user_stats.get("totalTimeTaken", 0),
-            "bestScore": round(user_stats.get("bestScore", 0), 2),
-            "recentTests": user_stats.get("recentTests", [])[-5:], 
-            "subjectPerformance": subject_stats
-        }), 200
+        rollup = db.user_stats.find_one({"_id": user_id})
+        if rollup is None and db.test_results.find_one({"userId": user_id}, {"_id": 1}):
+            # Results saved before rollups existed; build this user's once.
+            backfill_user_stats(db, user_id=user_id)
+            rollup = db.user_stats.find_one({"_id": user_id})
+        return jsonify(stats_response(rollup)), 200
         
     except Exception as e:
         print(f"Error fetching user stats: {str(e)}")
@@ -751,32 +1536,183 @@ def get_stats():
         "total_images": len(images_data),
         "total_associations": len(question_image_associations),
         "subject_distribution": subject_counts,
-        "questions_with_images": len([a for a in question_image_associations])
+        "questions_with_images": len(best_image_by_question),
+        "duplicates_dropped": dict(dedup_stats),
+        "image_duplicates_dropped": dict(image_dedup_stats),
+        "mcq_cache": mcq_cache.snapshot_stats(),
+        "query_cache": query_cache.snapshot_stats(),
+        "question_pool": question_pool.snapshot_stats() if QUESTION_POOL_ENABLED else None,
+        "serving_mode": SERVING_MODE,
+        "corpus_generation": corpus_generation
     }), 200
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Corpus sizes are read here rather than updated on every change.
+    metrics.CORPUS_SIZE.labels('questions').set(len(questions_data))
+    metrics.CORPUS_SIZE.labels('images').set(len(images_data))
+    metrics.CORPUS_SIZE.labels('associations').set(len(question_image_associations))
+    body, content_type = metrics.render_metrics()
+    return Response(body, content_type=content_type)
+
+def restore_corpus_from_snapshot(snapshot, pdf_hashes):
+    global question_faiss_index, image_faiss_index, question_vectors, image_vectors, corpus_is_mapped
+
+    kept_pdfs = {
+        name: info for name, info in snapshot["pdfs"].items()
+        if pdf_hashes.get(name) == info.get("sha256")
+    }
+    pending = [name for name in pdf_hashes if name not in kept_pdfs]
+
+    if len(kept_pdfs) == len(snapshot["pdfs"]) and not pending:
+        # Nothing changed on disk: serve straight from the memory-mapped files.
+        install_snapshot(snapshot)
+        return pending
+
+    # Some PDFs changed or disappeared: keep only rows from unchanged files
+    # and rebuild the indexes from their stored vectors.
+    removed_pdfs = set(snapshot["pdfs"]) - set(kept_pdfs)
+    question_rows = release_references(snapshot["questions"], removed_pdfs)
+    image_rows = release_references(snapshot["images"], removed_pdfs)
+
+    questions_data.extend(snapshot["questions"][i] for i in question_rows)
+    images_data.extend(snapshot["images"][i] for i in image_rows)
+    kept_question_ids = {q["id"] for q in questions_data}
+    kept_image_ids = {img["id"] for img in images_data}
+    question_image_associations.extend(
+        a for a in snapshot["associations"]
+        if a["question_id"] in kept_question_ids and a["image_id"] in kept_image_ids
+    )
+
+    question_vectors = np.array(snapshot["question_vectors"][question_rows], dtype='float32').reshape(-1, EMBEDDING_DIM)
+    image_vectors = np.array(snapshot["image_vectors"][image_rows], dtype='float32').reshape(-1, EMBEDDING_DIM)
+    question_faiss_index = build_faiss_index(question_vectors)
+    image_faiss_index = build_faiss_index(image_vectors)
+    corpus_is_mapped = False
+    processed_pdfs.update(kept_pdfs)
+    rebuild_derived_indexes()
+    return pending
+
 def process_all_pdfs_on_startup():
     print("Processing all existing PDFs in folder...")
     global questions_data, images_data, question_image_associations
+    global question_faiss_index, image_faiss_index, question_vectors, image_vectors, corpus_is_mapped
     
     questions_data.clear()
     images_data.clear()
     question_image_associations.clear()
-    
-    for filename in os.listdir(pdf_folder):
+    processed_pdfs.clear()
+    rebuild_derived_indexes()
+    question_vectors = np.empty((0, EMBEDDING_DIM), dtype='float32')
+    image_vectors = np.empty((0, EMBEDDING_DIM), dtype='float32')
+    question_faiss_index = build_faiss_index(question_vectors)
+    image_faiss_index = build_faiss_index(image_vectors)
+    corpus_is_mapped = False
+
+    pdf_hashes = {}
+    for filename in sorted(os.listdir(pdf_folder)):
         if filename.lower().endswith('.pdf'):
-            pdf_path = os.path.join(pdf_folder, filename)
-            print(f"Processing {filename}...")
-            try:
-                extracted_questions, extracted_images, associations = extract_pdf_data_enhanced(pdf_path, output_dir)
-                store_enhanced_data_to_faiss(extracted_questions, extracted_images, associations)
-                print(f"  - Questions: {len(extracted_questions)}")
-                print(f"  - Images: {len(extracted_images)}")
-                print(f"  - Associations: {len(associations)}")
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
+            pdf_hashes[filename] = file_sha256(os.path.join(pdf_folder, filename))
+
+    snapshot = load_snapshot(snapshot_dir, EMBEDDING_MODEL_NAME)
+    if snapshot:
+        loaded_generation = snapshot["generation"]
+        pending = restore_corpus_from_snapshot(snapshot, pdf_hashes)
+        print(f"Loaded snapshot: {len(processed_pdfs)} PDFs up to date, {len(pending)} to process")
+    else:
+        loaded_generation = None
+        pending = list(pdf_hashes)
+
+    changed = bool(pending) or (snapshot is not None and set(processed_pdfs) != set(snapshot["pdfs"]))
+    # FAISS_INDEX_TYPE may differ from the type the snapshot was written with.
+    changed = retrain_indexes_if_needed() or changed
+    for filename in pending:
+        pdf_path = os.path.join(pdf_folder, filename)
+        print(f"Processing {filename}...")
+        try:
+            extracted_questions, extracted_images, associations, duplicates = ingest_pdf(pdf_path)
+            print(f"  - Questions: {len(extracted_questions)} ({sum(duplicates['questions'].values())} duplicates dropped)")
+            print(f"  - Images: {len(extracted_images)} ({sum(duplicates['images'].values())} duplicates dropped)")
+            print(f"  - Associations: {len(associations)}")
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+
+    if changed or snapshot is None:
+        save_corpus_snapshot()
+    with ingest_jobs_lock:
+        jobs_active = any(job["status"] in ("queued", "running") for job in ingest_jobs.values())
+    # Files written after the generation this corpus was loaded from may
+    # belong to another process's unpublished upload.
+    if not jobs_active and loaded_generation is not None:
+        remove_unreferenced_image_files(generation_time(loaded_generation))
     
     print(f"Finished processing PDFs. Total: {len(questions_data)} questions, {len(images_data)} images, {len(question_image_associations)} associations")
 
+question_pool = QuestionPool(
+    source_fn=sample_pool_candidates,
+    generate_fn=generate_cached_mcq,
+    validate_fn=is_valid_mcq,
+    limiter=TokenBucketLimiter(QUESTION_POOL_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE),
+    low_watermark=QUESTION_POOL_LOW_WATERMARK,
+    high_watermark=QUESTION_POOL_HIGH_WATERMARK
+)
+
+def start_question_pool():
+    if not QUESTION_POOL_ENABLED:
+        return
+    question_pool.register('All')
+    for subject in {q.get("subject") for q in questions_data if q.get("subject")}:
+        question_pool.register(subject)
+    question_pool.start()
+
+def ensure_mongo_indexes():
+    # A database that is down at start should not keep the API from serving
+    # questions; `python manage.py ensure-indexes` can be run later.
+    try:
+        for collection, names in ensure_indexes(db).items():
+            print(f"Created MongoDB indexes on {collection}: {', '.join(names)}")
+    except Exception as e:
+        print(f"Could not ensure MongoDB indexes: {e}")
+
+def warm_query_cache():
+    if not QUERY_CACHE_WARM_TOPICS_FILE:
+        return
+    with open(QUERY_CACHE_WARM_TOPICS_FILE, 'r', encoding='utf-8') as f:
+        topics = [line.strip() for line in f if line.strip()]
+    print(f"Pre-embedded {query_cache.warm(topics)} topics from {QUERY_CACHE_WARM_TOPICS_FILE}")
+
+def build_snapshot():
+    # Shared mode's startup step, run once before the workers start (see
+    # gunicorn.conf.py): ingest new or changed PDFs and publish a generation.
+    with ingest_file_lock():
+        ensure_mongo_indexes()
+        with corpus_lock:
+            process_all_pdfs_on_startup()
+
+def warm_up():
+    # Runs beside the web server so /api/health answers at once; /api/ready
+    # turns 200 when the corpus is loaded and the embedder is in memory.
+    if SERVING_MODE == 'shared':
+        if not refresh_corpus_generation():
+            print("No snapshot generation published yet; serving an empty corpus")
+        threading.Thread(target=watch_corpus_generation, name='generation-watch', daemon=True).start()
+    else:
+        ensure_mongo_indexes()
+        with corpus_lock:
+            process_all_pdfs_on_startup()
+    readiness["corpus"] = True
+    start_question_pool()
+    try:
+        get_embedder()
+        warm_query_cache()
+    except Exception as e:
+        print(f"Error loading embedding model: {e}")
+
+def start_background_services():
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
 if __name__ == '__main__':
-    process_all_pdfs_on_startup()
-    app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
\ No newline at end of file
+    start_background_services()
+    # The reloader would run this module again in a child process, loading
+    # the corpus and the model and starting the question pool twice.
+    app.run(debug=True, use_reloader=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
\ No newline at end of file
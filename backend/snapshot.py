@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import faiss
+import numpy as np
+
+# Bump whenever the layout of the files below or the metadata schema changes;
+# older snapshots are then ignored and the corpus is rebuilt from the PDFs.
+SNAPSHOT_VERSION = 4
+
+METADATA_FILE = "metadata.json"
+QUESTION_INDEX_FILE = "questions.faiss"
+IMAGE_INDEX_FILE = "images.faiss"
+QUESTION_VECTORS_FILE = "question_vectors.npy"
+IMAGE_VECTORS_FILE = "image_vectors.npy"
+
+# Each save writes a complete generation directory and then atomically
+# replaces CURRENT, a one-line file naming it. Readers that follow CURRENT
+# always see one whole generation, and processes that still map an older
+# one keep reading it until they switch (unlinked mapped files stay valid).
+CURRENT_FILE = "CURRENT"
+GENERATIONS_DIR = "generations"
+KEEP_GENERATIONS = 3
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# IO_FLAG_MMAP only maps IVF inverted lists; IO_FLAG_MMAP_IFC (faiss >= 1.11)
+# also maps the code arrays of flat, scalar-quantizer and HNSW indexes and
+# the HNSW graph, so every index type here is read from the page cache
+# rather than copied into each process. What stays private per process is
+# small: IVF coarse quantizers, PQ codebooks and precomputed tables.
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+def read_index(path, mmap=True):
+    if mmap:
+        try:
+            return faiss.read_index(path, MMAP_FLAG | faiss.IO_FLAG_READ_ONLY)
+        except Exception as e:
+            print(f"Memory-mapped read of {path} failed, loading into memory: {e}")
+    return faiss.read_index(path)
+
+
+def current_generation(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def generation_time(generation):
+    """Seconds since the epoch at which `generation` was published."""
+    return int(generation.split("-")[0]) / 1e9
+
+
+def load_snapshot(snapshot_dir, embedding_model, mmap=True):
+    generation = current_generation(snapshot_dir)
+    if generation is None:
+        return None
+    generation_dir = os.path.join(snapshot_dir, GENERATIONS_DIR, generation)
+    metadata_path = os.path.join(generation_dir, METADATA_FILE)
+    if not os.path.exists(metadata_path):
+        return None
+
+    try:
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        if metadata.get("version") != SNAPSHOT_VERSION:
+            print(f"Ignoring snapshot with version {metadata.get('version')} (expected {SNAPSHOT_VERSION})")
+            return None
+        if metadata.get("embedding_model") != embedding_model:
+            print(f"Ignoring snapshot built with {metadata.get('embedding_model')} (current model {embedding_model})")
+            return None
+
+        mmap_mode = "r" if mmap else None
+        snapshot = {
+            "generation": generation,
+            "pdfs": metadata["pdfs"],
+            "questions": metadata["questions"],
+            "images": metadata["images"],
+            "associations": metadata["associations"],
+            "question_vectors": np.load(os.path.join(generation_dir, QUESTION_VECTORS_FILE), mmap_mode=mmap_mode),
+            "image_vectors": np.load(os.path.join(generation_dir, IMAGE_VECTORS_FILE), mmap_mode=mmap_mode),
+            "question_index": read_index(os.path.join(generation_dir, QUESTION_INDEX_FILE), mmap),
+            "image_index": read_index(os.path.join(generation_dir, IMAGE_INDEX_FILE), mmap),
+            "partitions": {
+                partition["subject"]: {
+                    "index": read_index(os.path.join(generation_dir, partition["file"]), mmap),
+                    "rows": partition["rows"],
+                }
+                for partition in metadata.get("partitions", [])
+            },
+        }
+    except Exception as e:
+        print(f"Failed to load snapshot generation {generation} from {snapshot_dir}: {e}")
+        return None
+
+    if (snapshot["question_index"].ntotal != len(snapshot["questions"]) or
+            snapshot["image_index"].ntotal != len(snapshot["images"]) or
+            len(snapshot["question_vectors"]) != len(snapshot["questions"]) or
+            len(snapshot["image_vectors"]) != len(snapshot["images"]) or
+            any(p["index"].ntotal != len(p["rows"]) for p in snapshot["partitions"].values())):
+        print(f"Snapshot generation {generation} in {snapshot_dir} is inconsistent, ignoring it")
+        return None
+
+    return snapshot
+
+
+def _replace(path, write):
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _save_npy(path, vectors):
+    with open(path, "wb") as f:
+        np.save(f, np.ascontiguousarray(vectors, dtype="float32"))
+
+
+def _prune_generations(generations_dir, keep):
+    generations = sorted(name for name in os.listdir(generations_dir) if not name.startswith("."))
+    for name in generations[:-keep]:
+        shutil.rmtree(os.path.join(generations_dir, name), ignore_errors=True)
+
+
+def save_snapshot(snapshot_dir, embedding_model, pdfs, questions, images, associations,
+                  question_index, image_index, question_vectors, image_vectors, partitions=None):
+    """Write a new generation and make it current; returns its name.
+
+    `partitions` maps subject -> {"index", "rows"} for the per-subject
+    question indexes, which are stored so readers can map them too.
+    """
+    generations_dir = os.path.join(snapshot_dir, GENERATIONS_DIR)
+    os.makedirs(generations_dir, exist_ok=True)
+
+    # Names sort by creation time, which _prune_generations relies on.
+    generation = f"{time.time_ns():020d}-{os.getpid()}"
+    tmp_dir = os.path.join(generations_dir, f".{generation}.tmp")
+    os.makedirs(tmp_dir)
+
+    _save_npy(os.path.join(tmp_dir, QUESTION_VECTORS_FILE), question_vectors)
+    _save_npy(os.path.join(tmp_dir, IMAGE_VECTORS_FILE), image_vectors)
+    faiss.write_index(question_index, os.path.join(tmp_dir, QUESTION_INDEX_FILE))
+    faiss.write_index(image_index, os.path.join(tmp_dir, IMAGE_INDEX_FILE))
+
+    partition_entries = []
+    for n, (subject, partition) in enumerate((partitions or {}).items()):
+        filename = f"partition_{n}.faiss"
+        faiss.write_index(partition["index"], os.path.join(tmp_dir, filename))
+        partition_entries.append({"subject": subject, "file": filename, "rows": list(partition["rows"])})
+
+    metadata = {
+        "version": SNAPSHOT_VERSION,
+        "embedding_model": embedding_model,
+        "pdfs": pdfs,
+        "questions": questions,
+        "images": images,
+        "associations": associations,
+        "partitions": partition_entries,
+    }
+    with open(os.path.join(tmp_dir, METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, separators=(",", ":"), ensure_ascii=False)
+
+    os.rename(tmp_dir, os.path.join(generations_dir, generation))
+
+    def write_current(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generation)
+
+    _replace(os.path.join(snapshot_dir, CURRENT_FILE), write_current)
+    _prune_generations(generations_dir, KEEP_GENERATIONS)
+    return generation
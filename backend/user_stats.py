@@ -0,0 +1,141 @@
+from pymongo import ReplaceOne
+
+# Rollups live in db.user_stats with _id = userId, so reading one is a
+# point lookup on the _id index.
+RECENT_TESTS_LIMIT = 5
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def subject_key(subject):
+    # Subject names become field names; "." and a leading "$" are not allowed there.
+    return str(subject).replace(".", "_").lstrip("$") or "_"
+
+
+def _recent_entry(test_result):
+    return {
+        "testName": test_result.get("testName"),
+        "score": test_result.get("results", {}).get("percentage"),
+        "completedAt": test_result.get("completedAt"),
+        "subjects": test_result.get("subjects"),
+    }
+
+
+def _subject_counts(test_result):
+    counts = {}
+    for subject in test_result.get("subjects") or []:
+        counts[subject] = counts.get(subject, 0) + 1
+    return counts
+
+
+def rollup_update(test_result):
+    """The update that folds one saved test result into its user's rollup."""
+    percentage = _number(test_result.get("results", {}).get("percentage"))
+    increments = {
+        "totalTests": 1,
+        "totalQuestions": _number(test_result.get("totalQuestions")),
+        "totalTimeTaken": _number(test_result.get("timeTaken")),
+        "percentageSum": percentage,
+    }
+    names = {}
+    # A subject listed twice counts twice, as $unwind did; the counts are
+    # merged first because one update cannot $inc the same path twice.
+    for subject, count in _subject_counts(test_result).items():
+        key = subject_key(subject)
+        increments[f"subjects.{key}.percentageSum"] = percentage * count
+        increments[f"subjects.{key}.testCount"] = count
+        names[f"subjects.{key}.name"] = subject
+
+    update = {
+        "$inc": increments,
+        "$max": {"bestScore": percentage},
+        "$push": {"recentTests": {"$each": [_recent_entry(test_result)], "$slice": -RECENT_TESTS_LIMIT}},
+    }
+    if names:
+        update["$set"] = names
+    return update
+
+
+def record_test_result(db, test_result):
+    """Fold a result, already inserted into test_results, into its rollup.
+
+    When this creates the rollup, the user may have results saved before
+    rollups existed, so it is rebuilt from all of them instead.
+    """
+    result = db.user_stats.update_one({"_id": test_result["userId"]}, rollup_update(test_result), upsert=True)
+    if result.upserted_id is not None:
+        backfill_user_stats(db, user_id=test_result["userId"])
+
+
+def build_rollup(user_id, test_results):
+    """A complete rollup document from a user's results in insertion order."""
+    rollup = {
+        "_id": user_id, "totalTests": 0, "totalQuestions": 0, "totalTimeTaken": 0,
+        "percentageSum": 0, "bestScore": None, "recentTests": [], "subjects": {},
+    }
+    for test_result in test_results:
+        percentage = _number(test_result.get("results", {}).get("percentage"))
+        rollup["totalTests"] += 1
+        rollup["totalQuestions"] += _number(test_result.get("totalQuestions"))
+        rollup["totalTimeTaken"] += _number(test_result.get("timeTaken"))
+        rollup["percentageSum"] += percentage
+        rollup["bestScore"] = percentage if rollup["bestScore"] is None else max(rollup["bestScore"], percentage)
+        rollup["recentTests"] = (rollup["recentTests"] + [_recent_entry(test_result)])[-RECENT_TESTS_LIMIT:]
+        for subject, count in _subject_counts(test_result).items():
+            entry = rollup["subjects"].setdefault(subject_key(subject), {"name": subject, "percentageSum": 0, "testCount": 0})
+            entry["percentageSum"] += percentage * count
+            entry["testCount"] += count
+    return rollup
+
+
+def backfill_user_stats(db, user_id=None, batch_size=500):
+    """Rebuild rollups from test_results; returns the number of users written.
+
+    Results saved while this runs may be counted twice or missed for their
+    user, so run it while writes are paused (or re-run it afterwards).
+    """
+    query = {"userId": user_id} if user_id else {}
+    projection = {"userId": 1, "testName": 1, "subjects": 1, "totalQuestions": 1,
+                  "timeTaken": 1, "completedAt": 1, "results.percentage": 1}
+    by_user = {}
+    for test_result in db.test_results.find(query, projection).sort("_id", 1):
+        by_user.setdefault(test_result["userId"], []).append(test_result)
+
+    writes = [ReplaceOne({"_id": uid}, build_rollup(uid, results), upsert=True) for uid, results in by_user.items()]
+    for start in range(0, len(writes), batch_size):
+        db.user_stats.bulk_write(writes[start:start + batch_size], ordered=False)
+    return len(writes)
+
+
+def stats_response(rollup):
+    """The /api/user-stats payload for a rollup document (or None)."""
+    if not rollup or not rollup.get("totalTests"):
+        return {
+            "totalTests": 0,
+            "averageScore": 0,
+            "totalQuestions": 0,
+            "totalTimeTaken": 0,
+            "bestScore": 0,
+            "recentTests": [],
+            "subjectPerformance": []
+        }
+
+    total_tests = rollup["totalTests"]
+    return {
+        "totalTests": total_tests,
+        "averageScore": round(rollup.get("percentageSum", 0) / total_tests, 2),
+        "totalQuestions": rollup.get("totalQuestions", 0),
+        "totalTimeTaken": rollup.get("totalTimeTaken", 0),
+        "bestScore": round(rollup.get("bestScore") or 0, 2),
+        "recentTests": rollup.get("recentTests", []),
+        "subjectPerformance": [
+            {
+                "_id": subject["name"],
+                "averageScore": subject["percentageSum"] / subject["testCount"],
+                "testCount": subject["testCount"],
+            }
+            for subject in rollup.get("subjects", {}).values() if subject.get("testCount")
+        ]
+    }
@@ -0,0 +1,85 @@
+import math
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "fp16")
+# Types whose quantizers are learned from the data and therefore need a
+# reasonably sized training set before they beat a flat scan.
+TRAINED_INDEX_TYPES = ("ivf_flat", "ivf_pq", "sq8")
+
+HNSW_M = 32
+PQ_SUBQUANTIZERS = 48  # 384 / 48 = 8 dimensions per 8-bit code
+
+
+def ivf_nlist(num_vectors):
+    # ~4*sqrt(n) lists, but never fewer than ~39 training points per list.
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def effective_index_type(index_type, num_vectors, min_train_vectors):
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+    if index_type in TRAINED_INDEX_TYPES and num_vectors < min_train_vectors:
+        return "flat"
+    return index_type
+
+
+def factory_string(index_type, num_vectors):
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{HNSW_M},Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{ivf_nlist(num_vectors)},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{ivf_nlist(num_vectors)},PQ{PQ_SUBQUANTIZERS}"
+    if index_type == "sq8":
+        return "SQ8"
+    return "SQfp16"
+
+
+def index_type_of(index):
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8" if index.sq.qtype == faiss.ScalarQuantizer.QT_8bit else "fp16"
+    return "flat"
+
+
+def configure_search(index, nprobe=16, ef_search=64):
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(nprobe, index.nlist)
+    return index
+
+
+def build_index(vectors, dim, index_type="flat", min_train_vectors=10000, nprobe=16, ef_search=64):
+    vectors = np.ascontiguousarray(vectors, dtype="float32").reshape(-1, dim)
+    kind = effective_index_type(index_type, len(vectors), min_train_vectors)
+    index = faiss.index_factory(dim, factory_string(kind, len(vectors)), faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    if len(vectors):
+        index.add(vectors)
+    return configure_search(index, nprobe, ef_search)
+
+
+def needs_rebuild(index, index_type, num_vectors, min_train_vectors):
+    """True when the index should be rebuilt (and retrained) from the raw vectors.
+
+    That happens when the configured type differs from what is in memory
+    (including crossing `min_train_vectors`), or when an IVF index's list
+    count is less than half of what the current corpus size calls for.
+    """
+    wanted = effective_index_type(index_type, num_vectors, min_train_vectors)
+    if index_type_of(index) != wanted:
+        return True
+    if isinstance(index, faiss.IndexIVF):
+        return ivf_nlist(num_vectors) >= 2 * index.nlist
+    return False
@@ -80,6 +80,7 @@ export default function CreateMockTest() {
   const [testData, setTestData] = useState(null);
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [testHistory, setTestHistory] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null);
   const [testId, setTestId] = useState(null);
   const [searchTerm, setSearchTerm] = useState("");
   const [filterType, setFilterType] = useState("all");
@@ -107,11 +108,12 @@ export default function CreateMockTest() {
             headers: {
               "Content-Type": "application/json",
             },
-            body: JSON.stringify({ userId: user.uid }),
+            body: JSON.stringify({ userId: user.uid, mode: "list" }),
           });
           const data = await response.json();
           if (response.ok) {
             setTestHistory(data.tests || []);
+            setHistoryCursor(data.next_cursor || null);
           } else {
             console.error("Failed to fetch test history:", data.error);
           }
@@ -263,10 +265,49 @@ export default function CreateMockTest() {
     router.push("/takeTest");
   };
 
-  const handleRetakeTest = (test) => {
+  const loadMoreHistory = async () => {
+    const user = auth.currentUser;
+    if (!user || !historyCursor) return;
+    try {
+      const response = await fetch("http://localhost:5000/api/test-history", {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ userId: user.uid, mode: "list", cursor: historyCursor }),
+      });
+      const data = await response.json();
+      if (response.ok) {
+        setTestHistory((history) => [...history, ...(data.tests || [])]);
+        setHistoryCursor(data.next_cursor || null);
+      } else {
+        console.error("Failed to fetch test history:", data.error);
+      }
+    } catch (error) {
+      console.error("Error fetching test history:", error);
+    }
+  };
+
+  const handleRetakeTest = async (test) => {
+    let questions = test.questions;
+    if (!questions) {
+      // The history list only carries summaries; load the full test on demand.
+      try {
+        const response = await fetch(`http://localhost:5000/api/tests/${test.testId}`);
+        const data = await response.json();
+        if (!response.ok) {
+          console.error("Failed to load test:", data.error);
+          return;
+        }
+        questions = data.questions;
+      } catch (error) {
+        console.error("Error loading test:", error);
+        return;
+      }
+    }
     const testData = {
       testId: test.testId,
-      questions: test.questions,
+      questions,
       timeLimit: test.timeLimit,
       testType: test.testType,
       subjects: test.subjects,
@@ -580,6 +621,17 @@ export default function CreateMockTest() {
                 ))}
               </div>
             )}
+
+            {historyCursor && (
+              <div className="text-center mt-4">
+                <button
+                  onClick={loadMoreHistory}
+                  className="px-4 py-2 border border-[#FA812F] text-[#FA812F] hover:bg-[#FA812F]/10 rounded-lg transition-colors"
+                >
+                  Load more
+                </button>
+              </div>
+            )}
           </div>
         </div>
       </div>
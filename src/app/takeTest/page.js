@@ -357,10 +357,14 @@ export default function TakeTest() {
                   {currentQuestion.question}
                 </h2>
 
-                {currentQuestion.image_data && (
+                {(currentQuestion.image_url || currentQuestion.image_data) && (
                   <div className="mb-6 bg-white rounded-lg p-4">
                     <Image
-                      src={currentQuestion.image_data}
+                      src={
+                        currentQuestion.image_url
+                          ? `http://localhost:5000${currentQuestion.image_url}`
+                          : currentQuestion.image_data
+                      }
                       alt="Question diagram"
                       className="max-w-full h-auto rounded-lg mx-auto"
                     />